@@ -0,0 +1,107 @@
+"""
+Benchmarks the import pipeline end to end, from the statement bytes to the rows in the spreadsheet, against the
+in-process fake Google Sheets backend of `benchmarks.fake_sheets`: every API call is counted, delayed by a
+simulated latency and throttled with 429 errors past the per-minute quota, so that the cost of the batching,
+the caches and the backoff is measured without touching Google.
+
+For each size, a synthetic statement is parsed with StatementParser and imported with GSpreadFinanceManager in
+resume mode. The report gives the parse time, the import time, the API calls made, the 429 answered, the rows
+written per second and the peak RSS of the process. The settings (worksheet names, batch size, write mode...)
+are read from config/config.json, like the bot does; the spreadsheet and the credentials are never used.
+
+Usage: python -m benchmarks.bench_import [--bank revolut] [--rows 1000 100000] [--latency 0.2] [--per-row]
+"""
+import argparse
+import resource
+import tempfile
+import time
+import uuid
+
+from benchmarks.fake_sheets import FakeQuota, FakeSheetsBackend
+from benchmarks.generators import GENERATORS, statement_bytes
+from sheets.dedup_index import DedupIndex
+from sheets.google_sheet_manager import GSpreadFinanceManager
+from sheets.rate_limiter import SheetsRateLimiter
+from sheets.statement_parser import StatementParser
+
+
+class BenchmarkManager(GSpreadFinanceManager):
+    """A GSpreadFinanceManager talking to a FakeSheetsBackend, with its own spreadsheet and dedup index."""
+    def __init__(self, backend, dedup_path, time_scale=1, **kwargs):
+        self.backend = backend
+        super().__init__(**kwargs)
+        self.spreadsheet_id = f"benchmark-{uuid.uuid4().hex}"
+        self.dedup_index = DedupIndex(dedup_path)
+        # the client-side pacing runs on the same accelerated clock as the fake quota
+        per_minute = backend.quota.per_minute * time_scale if backend.quota else 10 ** 9
+        self.rate_limiter = SheetsRateLimiter(per_minute, per_minute, base_delay=2 / time_scale)
+        self.retry_delay = self.retry_delay / time_scale
+
+    def _init_client(self, service_account_file):
+        return self.backend
+
+
+def peak_rss_mb():
+    """Peak resident set size of the process so far, in MB (ru_maxrss is in KB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run(bank, count, file_format='csv', latency=0.0, quota=60, time_scale=60, per_row=False, ordered=False):
+    """Imports a synthetic statement of `count` rows and returns the measurements as a dictionary."""
+    data = statement_bytes(bank, GENERATORS[bank](count), file_format)
+
+    start = time.perf_counter()
+    transactions = StatementParser(data, bank).read_transactions()
+    parse_time = time.perf_counter() - start
+
+    backend = FakeSheetsBackend(latency, FakeQuota(quota, time_scale) if quota else None)
+    with tempfile.TemporaryDirectory() as folder:
+        manager = BenchmarkManager(backend, f"{folder}/dedup_index.sqlite3", time_scale)
+        start = time.perf_counter()
+        added = manager.insert_transactions(transactions, resume_mode=True, ordered=ordered, bulk=not per_row)
+        import_time = time.perf_counter() - start
+
+    return {
+        'rows': count,
+        'size_mb': len(data) / 1024 ** 2,
+        'parse_s': parse_time,
+        'import_s': import_time,
+        'written': sum(added),
+        'api_calls': sum(backend.calls.values()),
+        'calls': dict(backend.calls),
+        'throttled': backend.throttled,
+        'rows_per_s': count / (parse_time + import_time),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the import pipeline against a fake Google Sheets.")
+    parser.add_argument('--bank', choices=sorted(GENERATORS), default='revolut')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000, 10_000, 100_000, 1_000_000],
+                        help="statement sizes to benchmark")
+    parser.add_argument('--format', choices=['csv', 'xlsx'], default='csv', dest='file_format')
+    parser.add_argument('--latency', type=float, default=0.0, help="simulated seconds per API call")
+    parser.add_argument('--quota', type=int, default=60, help="requests per minute of each kind, 0 for no quota")
+    parser.add_argument('--time-scale', type=float, default=60,
+                        help="speed of the simulated clock of the quota (60: a minute lasts a second)")
+    parser.add_argument('--per-row', action='store_true', help="write one row per request instead of blocks")
+    parser.add_argument('--ordered', action='store_true', help="write the rows in ascending date order")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    print(f"{'rows':>9} {'MB':>7} {'parse s':>8} {'import s':>9} {'written':>9} {'calls':>6} {'429':>5} "
+          f"{'rows/s':>9} {'RSS MB':>7}")
+    for count in args.rows:
+        result = run(args.bank, count, args.file_format, args.latency, args.quota, args.time_scale, args.per_row,
+                     args.ordered)
+        print(f"{result['rows']:>9} {result['size_mb']:>7.1f} {result['parse_s']:>8.2f} {result['import_s']:>9.2f} "
+              f"{result['written']:>9} {result['api_calls']:>6} {result['throttled']:>5} "
+              f"{result['rows_per_s']:>9.0f} {result['peak_rss_mb']:>7.0f}")
+        print(f"{'':>9} calls by method: {result['calls']}")
+
+
+if __name__ == "__main__":
+    main()
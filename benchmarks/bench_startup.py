@@ -0,0 +1,51 @@
+"""
+Measures the cold start of the bot: the time and memory it takes to import `main` (everything the bot loads
+before it can answer /start), compared with the heavy modules it imports lazily. Each measurement runs in a
+fresh interpreter, so nothing is cached between runs but the OS file cache; the median of the runs is reported,
+together with the heavy dependencies that ended up loaded. Like the bot, it needs config/config.json.
+
+Usage: python -m benchmarks.bench_startup [runs] [module ...]
+"""
+import json
+import statistics
+import subprocess
+import sys
+
+from jobs.prewarm import HEAVY_MODULES
+
+HEAVY_PACKAGES = ('pandas', 'numpy', 'openpyxl', 'gspread', 'google.auth')
+
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+__import__(sys.argv[1])
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'seconds': elapsed,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'loaded': [name for name in sys.argv[2:] if name in sys.modules],
+}))
+"""
+
+
+def measure(module, runs=5):
+    """Imports `module` in `runs` fresh interpreters and returns the median seconds and MB, and the heavy packages."""
+    results = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', PROBE, module, *HEAVY_PACKAGES],
+                                check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.splitlines()[-1]))
+    return (statistics.median(result['seconds'] for result in results),
+            statistics.median(result['rss_mb'] for result in results),
+            results[-1]['loaded'])
+
+
+def main(runs=5, modules=('main',) + HEAVY_MODULES):
+    print(f"{'module':<30} {'import s':>9} {'RSS MB':>7}  heavy dependencies loaded")
+    for module in modules:
+        seconds, rss_mb, loaded = measure(module, runs)
+        print(f"{module:<30} {seconds:>9.3f} {rss_mb:>7.0f}  {', '.join(loaded) or '-'}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5, tuple(sys.argv[2:]) or ('main',) + HEAVY_MODULES)
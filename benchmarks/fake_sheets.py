@@ -0,0 +1,179 @@
+"""
+An in-process fake of the parts of gspread used by GSpreadFinanceManager, to benchmark the import pipeline
+without hitting Google. The fake keeps the cells in memory, counts the API calls, adds a simulated latency to
+each of them and answers 429 errors like Google does when the per-minute quota is exceeded.
+"""
+import re
+import threading
+import time
+from collections import Counter, deque
+from gspread.exceptions import APIError, WorksheetNotFound
+
+
+class FakeResponse:
+    """The bits of a `requests.Response` gspread's APIError reads."""
+    def __init__(self, status_code, message):
+        self.status_code = status_code
+        self.text = message
+
+    def json(self):
+        return {"error": {"code": self.status_code, "message": self.text, "status": "RESOURCE_EXHAUSTED"}}
+
+
+class FakeQuota:
+    """
+    Allows `per_minute` requests of each kind per minute, like the Sheets API, failing the others with a 429.
+    With a `time_scale` of 60 a simulated minute lasts one second, so that quota-bound imports end quickly.
+    """
+    def __init__(self, per_minute=60, time_scale=1):
+        self.per_minute = per_minute
+        self.window = 60 / time_scale
+        self._requests = {'read': deque(), 'write': deque()}
+        self._lock = threading.Lock()
+
+    def check(self, kind):
+        with self._lock:
+            now = time.monotonic()
+            requests = self._requests[kind]
+            while requests and now - requests[0] >= self.window:
+                requests.popleft()
+            if len(requests) >= self.per_minute:
+                raise APIError(FakeResponse(429, f"Quota exceeded for quota metric '{kind} requests'"))
+            requests.append(now)
+
+
+def _to_value(cell):
+    value = cell.get("userEnteredValue", {})
+    return next(iter(value.values()), "")
+
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet, title, sheet_id):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.id = sheet_id
+        self.col_count = 26
+        self.rows = []
+
+    def _pad(self, row_count):
+        while len(self.rows) < row_count:
+            self.rows.append([])
+
+    def insert_row(self, values, index=1, value_input_option='RAW'):
+        self.spreadsheet.backend.call('write', 'insert_row')
+        self._pad(index - 1)
+        self.rows.insert(index - 1, list(values))
+
+    def update(self, range_name, values):
+        self.spreadsheet.backend.call('write', 'update')
+        start = int(re.search(r'\d+', range_name).group()) - 1 if re.search(r'\d+', range_name) else 0
+        self._pad(start + len(values))
+        for offset, row in enumerate(values):
+            self.rows[start + offset] = list(row)
+
+    def delete_rows(self, index):
+        self.spreadsheet.backend.call('write', 'delete_rows')
+        if index - 1 < len(self.rows):
+            del self.rows[index - 1]
+
+    def read(self, range_name):
+        """Returns the rows of a whole worksheet (None), of "N:N" or of "AN:A", the ranges the manager reads."""
+        if range_name is None:
+            return [row for row in self.rows]
+        first, _, last = range_name.partition(':')
+        start = int(re.sub(r'\D', '', first)) - 1
+        end = int(re.sub(r'\D', '', last)) if re.search(r'\d', last) else len(self.rows)
+        rows = self.rows[start:end]
+        if first.startswith('A') and last == 'A':
+            rows = [row[:1] for row in rows]
+        return rows
+
+
+class FakeSpreadsheet:
+    def __init__(self, backend, spreadsheet_id):
+        self.backend = backend
+        self.id = spreadsheet_id
+        self._worksheets = {}
+
+    def worksheet(self, title):
+        self.backend.call('read', 'worksheet')
+        if title not in self._worksheets:
+            if not self.backend.create_worksheets:
+                raise WorksheetNotFound(title)
+            self._worksheets[title] = FakeWorksheet(self, title, len(self._worksheets))
+        return self._worksheets[title]
+
+    def _by_id(self, sheet_id):
+        return next(worksheet for worksheet in self._worksheets.values() if worksheet.id == sheet_id)
+
+    def batch_update(self, body):
+        self.backend.call('write', 'batch_update')
+        for request in body["requests"]:
+            kind, spec = next(iter(request.items()))
+            if kind == "insertDimension":
+                worksheet = self._by_id(spec["range"]["sheetId"])
+                start, end = spec["range"]["startIndex"], spec["range"]["endIndex"]
+                worksheet._pad(start)
+                worksheet.rows[start:start] = [[] for _ in range(end - start)]
+            elif kind == "updateCells":
+                worksheet = self._by_id(spec["start"]["sheetId"])
+                start = spec["start"]["rowIndex"]
+                worksheet._pad(start + len(spec["rows"]))
+                for offset, row in enumerate(spec["rows"]):
+                    worksheet.rows[start + offset] = [_to_value(cell) for cell in row["values"]]
+            elif kind == "appendCells":
+                worksheet = self._by_id(spec["sheetId"])
+                while worksheet.rows and not any(worksheet.rows[-1]):
+                    worksheet.rows.pop()
+                worksheet.rows.extend([_to_value(cell) for cell in row["values"]] for row in spec["rows"])
+            elif kind == "sortRange":
+                worksheet = self._by_id(spec["range"]["sheetId"])
+                start = spec["range"].get("startRowIndex", 0)
+                descending = spec["sortSpecs"][0]["sortOrder"] == "DESCENDING"
+                worksheet.rows[start:] = sorted(worksheet.rows[start:], key=lambda row: str(row[0]) if row else "",
+                                                reverse=descending)
+            else:
+                raise NotImplementedError(kind)
+        return {"replies": []}
+
+    def values_batch_get(self, ranges, params=None):
+        self.backend.call('read', 'values_batch_get')
+        value_ranges = []
+        for a1_range in ranges:
+            title, _, range_name = a1_range.partition('!')
+            worksheet = self._worksheets[title[1:-1].replace("''", "'")]
+            value_ranges.append({"range": a1_range, "values": worksheet.read(range_name or None)})
+        return {"valueRanges": value_ranges}
+
+
+class FakeSheetsBackend:
+    """
+    Plays the role of the authorized gspread client. Every API call sleeps `latency` seconds, is counted in
+    `calls` (by method) and is checked against the `quota`, a FakeQuota; `throttled` counts the 429 answered.
+    Worksheets are created on first access unless `create_worksheets` is False.
+    """
+    def __init__(self, latency=0.0, quota=None, create_worksheets=True):
+        self.latency = latency
+        self.quota = quota
+        self.create_worksheets = create_worksheets
+        self.calls = Counter()
+        self.throttled = 0
+        self._spreadsheets = {}
+        self._lock = threading.Lock()
+
+    def call(self, kind, method):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.quota is not None:
+            try:
+                self.quota.check(kind)
+            except APIError:
+                with self._lock:
+                    self.throttled += 1
+                raise
+        with self._lock:
+            self.calls[method] += 1
+
+    def open_by_key(self, spreadsheet_id):
+        self.call('read', 'open_by_key')
+        return self._spreadsheets.setdefault(spreadsheet_id, FakeSpreadsheet(self, spreadsheet_id))
@@ -0,0 +1,123 @@
+"""
+Load test of the webhook mode without Telegram: this script plays both sides of the Bot API. It sends synthetic
+message updates to the webhook of the bot, from many simulated chats at once, and runs a fake Bot API server
+answering the requests of the bot (sendMessage, setWebhook...). Every chat sends its messages one at a time,
+waiting for the answer of the bot before sending the next one, and the latency from the update to the answer
+is measured.
+
+Run the bot with, in config/config.json, TELEGRAM.MODE "webhook", TELEGRAM.API_SERVER pointing to the fake server
+(e.g. "http://127.0.0.1:8081"), WEBHOOK_URL "http://127.0.0.1:8080" and a token shaped like "123456:TEST", then:
+
+Usage: python -m benchmarks.fake_telegram [--chats 50] [--messages 20] [--text /menu]
+"""
+import argparse
+import asyncio
+import itertools
+import statistics
+import time
+
+from aiohttp import ClientSession, web
+
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "Scrooge", "username": "scrooge_load_test_bot"}
+
+
+class FakeBotAPI:
+    """A Bot API server answering every method with a plausible result and resolving the chats' waiting futures."""
+    def __init__(self):
+        self.requests = 0
+        self.waiting = {}
+        self._message_ids = itertools.count(1)
+
+    async def handle(self, request):
+        self.requests += 1
+        method = request.match_info['method'].lower()
+        params = dict(await request.post()) if request.content_type != 'application/json' else await request.json()
+        if method in ('sendmessage', 'editmessagetext'):
+            chat_id = int(params.get('chat_id', 0))
+            future = self.waiting.pop(chat_id, None)
+            if future is not None and not future.done():
+                future.set_result(time.perf_counter())
+            result = {"message_id": next(self._message_ids), "date": int(time.time()),
+                      "chat": {"id": chat_id, "type": "private"}, "from": BOT_USER, "text": params.get('text', "")}
+        elif method == 'getme':
+            result = BOT_USER
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+
+def message_update(update_id, chat_id, text):
+    command = text.split()[0] if text.startswith('/') else None
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private"},
+        "from": {"id": chat_id, "is_bot": False, "first_name": f"Load{chat_id}"},
+        "text": text,
+    }
+    if command:
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+    return {"update_id": update_id, "message": message}
+
+
+async def run_chat(session, api, args, chat_id, update_ids, latencies):
+    headers = {'X-Telegram-Bot-Api-Secret-Token': args.secret} if args.secret else {}
+    for _ in range(args.messages):
+        answered = asyncio.get_running_loop().create_future()
+        api.waiting[chat_id] = answered
+        sent_at = time.perf_counter()
+        async with session.post(args.webhook, json=message_update(next(update_ids), chat_id, args.text),
+                                headers=headers) as response:
+            response.raise_for_status()
+        try:
+            latencies.append(await asyncio.wait_for(answered, args.timeout) - sent_at)
+        except asyncio.TimeoutError:
+            api.waiting.pop(chat_id, None)
+            latencies.append(None)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the webhook mode of the bot with fake updates.")
+    parser.add_argument('--webhook', default='http://127.0.0.1:8080/webhook', help="webhook URL of the bot")
+    parser.add_argument('--secret', default=None, help="TELEGRAM.WEBHOOK_SECRET of the bot")
+    parser.add_argument('--api-host', default='127.0.0.1')
+    parser.add_argument('--api-port', type=int, default=8081, help="port of the fake Bot API server")
+    parser.add_argument('--chats', type=int, default=50, help="simulated chats sending at the same time")
+    parser.add_argument('--messages', type=int, default=20, help="messages sent by each chat")
+    parser.add_argument('--text', default='/menu', help="text of the messages")
+    parser.add_argument('--timeout', type=float, default=30, help="seconds to wait for each answer")
+    parser.add_argument('--first-chat-id', type=int, default=10 ** 9)
+    return parser.parse_args(argv)
+
+
+async def main(argv=None):
+    args = parse_args(argv)
+    api = FakeBotAPI()
+    app = web.Application()
+    app.router.add_post('/bot{token}/{method}', api.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, args.api_host, args.api_port).start()
+    try:
+        latencies = []
+        update_ids = itertools.count(1)
+        start = time.perf_counter()
+        async with ClientSession() as session:
+            await asyncio.gather(*(run_chat(session, api, args, args.first_chat_id + chat, update_ids, latencies)
+                                   for chat in range(args.chats)))
+        elapsed = time.perf_counter() - start
+    finally:
+        await runner.cleanup()
+
+    answered = sorted(latency for latency in latencies if latency is not None)
+    print(f"{len(latencies)} updates from {args.chats} chats in {elapsed:.2f}s "
+          f"({len(latencies) / elapsed:.0f} updates/s), {len(latencies) - len(answered)} unanswered")
+    if answered:
+        print(f"latency p50 {statistics.median(answered) * 1000:.0f}ms, "
+              f"p95 {answered[int(len(answered) * 0.95) - 1 if len(answered) > 1 else 0] * 1000:.0f}ms, "
+              f"max {answered[-1] * 1000:.0f}ms")
+    print(f"Bot API requests received: {api.requests}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,73 @@
+"""
+Synthetic bank statements for the benchmarks: rows shaped like the Revolut and Unicredit exports, and the CSV
+or XLSX files holding them, built in memory like the statements the bot downloads from Telegram.
+"""
+import csv
+import io
+import random
+from datetime import datetime, timedelta
+
+from openpyxl import Workbook
+
+HEADERS = {
+    'revolut': ["Type", "Product", "Started Date", "Completed Date", "Description", "Amount", "Fee", "Currency",
+                "State", "Balance"],
+    'unicredit': ["Data", "Descrizione", "Importo", "Divisa"],
+}
+
+
+def generate_revolut_rows(count, seed=0):
+    """Returns `count` rows shaped like the ones openpyxl reads from a Revolut statement, oldest first."""
+    rng = random.Random(seed)
+    started = datetime(2020, 1, 1)
+    balance = 1000.0
+    rows = []
+    for _ in range(count):
+        started += timedelta(seconds=rng.randint(60, 36000))
+        is_topup = rng.random() < 0.1
+        amount = round(rng.uniform(50, 2000) if is_topup else -rng.uniform(1, 200), 2)
+        balance = round(balance + amount, 2)
+        rows.append([
+            "TOPUP" if is_topup else "CARD_PAYMENT", "Current", started, started + timedelta(seconds=5),
+            rng.choice(["Coffee", "Groceries", "Rent", "Salary", "Train"]), amount, 0.0, "EUR", "COMPLETED", balance,
+        ])
+    return rows
+
+
+def generate_unicredit_rows(count, seed=0):
+    """Returns `count` rows shaped like the ones of a Unicredit statement, with day-first dates, newest first."""
+    rng = random.Random(seed)
+    day = datetime(2020, 1, 1)
+    rows = []
+    for _ in range(count):
+        day += timedelta(days=rng.randint(0, 1))
+        is_income = rng.random() < 0.1
+        amount = round(rng.uniform(50, 2000) if is_income else -rng.uniform(1, 200), 2)
+        description = rng.choice(["BONIFICO", "PAGAMENTO POS", "ADDEBITO SDD", "PRELIEVO BANCOMAT"])
+        rows.append([day.strftime("%d/%m/%Y"), f"{description} {rng.randint(1, 99999)}", amount, "EUR"])
+    rows.reverse()
+    return rows
+
+
+GENERATORS = {
+    'revolut': generate_revolut_rows,
+    'unicredit': generate_unicredit_rows,
+}
+
+
+def statement_bytes(bank, rows, file_format='csv'):
+    """Returns the content of a statement file of the given bank and format ('csv' or 'xlsx') holding `rows`."""
+    if file_format == 'csv':
+        text = io.StringIO()
+        writer = csv.writer(text)
+        writer.writerow(HEADERS[bank])
+        writer.writerows(rows)
+        return text.getvalue().encode()
+    wb = Workbook(write_only=True)
+    sheet = wb.create_sheet()
+    sheet.append(HEADERS[bank])
+    for row in rows:
+        sheet.append(row)
+    stream = io.BytesIO()
+    wb.save(stream)
+    return stream.getvalue()
@@ -1,10 +1,15 @@
 import json
+import os
 import sys
+import tempfile
+import threading
+
+CONFIG_PATH = 'config/config.json'
 
 
 def load_config():
     try:
-        with open('config/config.json', 'r') as config_file:
+        with open(CONFIG_PATH, 'r') as config_file:
             config = json.load(config_file)
         return config
     except FileNotFoundError:
@@ -15,32 +20,76 @@ def load_config():
         sys.exit(1)
 
 
-def update_value(key_path, new_value):
+class ConfigStore:
     """
-    Updates a value in the JSON configuration file.
+    Holds the configuration in memory for the whole process. The file at `path` is read once, at startup;
+    afterwards reads are plain dictionary lookups on `data` and every change goes through `set`, which updates
+    the dictionary in place, persists it and notifies the subscribers of the key.
 
-    :param key_path: The path to the key in the dictionary, separated by periods (e.g. "SPREADSHEET.SHEET_ID").
-    :param new_value: The new value to set.
-    :return:
+    The file is rewritten atomically (a temporary file in the same folder, then renamed over the old one) under
+    a lock, so concurrent changes are serialized and a crash never leaves a truncated config.json behind.
     """
-    config = load_config()
-
-    keys = key_path.split('.')
-    d = config
-    for key in keys[:-1]:
-        d = d.setdefault(key, {})
-    d[keys[-1]] = new_value
+    def __init__(self, path=CONFIG_PATH):
+        self.path = path
+        self.data = load_config()
+        self._lock = threading.RLock()
+        self._subscribers = []
 
-    try:
-        with open('config/config.json', 'w') as config_file:
-            json.dump(config, config_file, indent=4)
-        print(f"Value for '{key_path}' updated successfully.")
-    except Exception as e:
-        print(f"Failed to update config file: {e}")
+    def get(self, key_path, default=None):
+        """Returns the value at `key_path` (e.g. "SPREADSHEET.SPREADSHEET_ID"), or `default` if it's missing."""
+        value = self.data
+        for key in key_path.split('.'):
+            if not isinstance(value, dict) or key not in value:
+                return default
+            value = value[key]
+        return value
 
+    def set(self, key_path, new_value):
+        """
+        Sets the value at `key_path`, creating the intermediate sections if needed, writes the file and then
+        calls the subscribers of the key. Nothing is notified if the value didn't change.
 
-CONFIG = load_config()
+        Raises:
+        - OSError: If the file can't be written; the value in memory is changed anyway.
+        """
+        keys = key_path.split('.')
+        with self._lock:
+            section = self.data
+            for key in keys[:-1]:
+                section = section.setdefault(key, {})
+            changed = section.get(keys[-1]) != new_value
+            section[keys[-1]] = new_value
+            self._write()
+            subscribers = [callback for callback, key_paths in self._subscribers
+                           if not key_paths or key_path in key_paths]
+        if changed:
+            for callback in subscribers:
+                callback(key_path, new_value)
 
+    def subscribe(self, callback, *key_paths):
+        """
+        Registers `callback(key_path, new_value)` to be called after any of `key_paths` changes, or after any
+        change at all if no key is given. Callbacks run in the thread calling `set`, so they must be quick.
+        """
+        with self._lock:
+            self._subscribers.append((callback, frozenset(key_paths)))
 
+    def _write(self):
+        folder = os.path.dirname(self.path) or '.'
+        descriptor, temp_path = tempfile.mkstemp(prefix='.config-', suffix='.json', dir=folder)
+        try:
+            with os.fdopen(descriptor, 'w') as config_file:
+                json.dump(self.data, config_file, indent=4)
+                config_file.flush()
+                os.fsync(config_file.fileno())
+            if os.path.exists(self.path):
+                os.chmod(temp_path, os.stat(self.path).st_mode)  # mkstemp creates the file readable by owner only
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
 
 
+CONFIG_STORE = ConfigStore()
+# live view of the configuration: the store updates this dictionary in place, so it never goes stale
+CONFIG = CONFIG_STORE.data
@@ -0,0 +1,27 @@
+import os
+import sqlite3
+
+
+def connect(path, *schema, wal=False):
+    """
+    Opens the SQLite database at `path`, creating its folder if needed, and runs the `schema` statements (the
+    `CREATE ... IF NOT EXISTS` of its tables and indexes). The connection is shared by the threads of the pool,
+    so the caller must serialize its use with a lock. With `wal` the database is switched to write-ahead logging,
+    so that readers don't wait for the writers.
+    """
+    folder = os.path.dirname(path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+    connection = sqlite3.connect(path, check_same_thread=False)
+    if wal:
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+    for statement in schema:
+        connection.execute(statement)
+    return connection
+
+
+def add_column(connection, table, column, definition):
+    """Adds a column to a table created by an older version of the bot, if it doesn't have it yet."""
+    if column not in [row[1] for row in connection.execute(f"PRAGMA table_info({table})")]:
+        connection.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
@@ -0,0 +1,128 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from config.config import CONFIG, CONFIG_STORE
+from config.database import connect
+
+# the settings holding a path, which a chat may only set inside a folder of the global configuration:
+# key path -> (section, key, default) of the folder
+CONFINED_PATHS = {
+    'SPREADSHEET.SERVICE_ACCOUNT_FILE': ('SPREADSHEET', 'SERVICE_ACCOUNTS_DIR', 'credentials'),
+    'SETTINGS.ATTACH_SAVING_PATH': ('SETTINGS', 'ATTACH_SAVING_ROOT', 'data/statements'),
+}
+
+
+def path_root(key_path):
+    """Returns the folder the chats' values of the path setting `key_path` must be in."""
+    section, key, default = CONFINED_PATHS[key_path]
+    return CONFIG[section].get(key, default)
+
+
+def confine_path(root, value):
+    """
+    Resolves a path set by a chat inside the folder `root`, so that a chat can't point the bot at any file of the
+    host: relative paths are taken from `root`, and paths leading out of it (absolute paths elsewhere, "..",
+    symbolic links) are refused. Returns the absolute path.
+
+    Raises:
+    - ValueError: If the path isn't inside `root`.
+    """
+    root = os.path.realpath(root)
+    path = os.path.realpath(os.path.join(root, value))
+    if os.path.commonpath([root, path]) != root:
+        raise ValueError(f"{value} is outside of {root}")
+    return path
+
+
+class ProfileStore:
+    """
+    The settings of each chat, so that one bot process can serve many users, each with their own spreadsheet.
+
+    A profile only stores the settings a chat has changed, as overrides of the global configuration (config.json),
+    which keeps acting as the defaults. Profiles are stored in a SQLite database at `path`; the resolved settings
+    of the `cache_size` most recently used chats are kept in an in-memory LRU cache, so resolving the settings of
+    an active chat is a dictionary lookup, without any file I/O.
+
+    The paths a chat sets (see `CONFINED_PATHS`) are only honoured inside their folder: a value leading out of
+    it, e.g. stored before the paths were confined, is ignored and the global default applies.
+    """
+    def __init__(self, path, cache_size=256):
+        self.path = path
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = connect(
+                self.path,
+                "CREATE TABLE IF NOT EXISTS profiles ("
+                "chat_id INTEGER NOT NULL, key_path TEXT NOT NULL, value TEXT NOT NULL, "
+                "PRIMARY KEY (chat_id, key_path))",
+            )
+        return self._connection
+
+    def _resolve(self, chat_id):
+        settings = {section: dict(values) for section, values in CONFIG.items()}
+        rows = self._connect().execute("SELECT key_path, value FROM profiles WHERE chat_id = ?", (chat_id,))
+        for key_path, value in rows:
+            value = json.loads(value)
+            if key_path in CONFINED_PATHS:
+                try:
+                    value = confine_path(path_root(key_path), value)
+                except (TypeError, ValueError):
+                    continue
+            section, key = key_path.split('.', 1)
+            settings.setdefault(section, {})[key] = value
+        return settings
+
+    def settings(self, chat_id):
+        """
+        Returns the settings of a chat, shaped like the global CONFIG (e.g. `settings['SPREADSHEET']['SPREADSHEET_ID']`).
+        With a `chat_id` of None the global CONFIG itself is returned. The result must not be modified.
+        """
+        if chat_id is None:
+            return CONFIG
+        with self._lock:
+            settings = self._cache.get(chat_id)
+            if settings is None:
+                settings = self._cache[chat_id] = self._resolve(chat_id)
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            else:
+                self._cache.move_to_end(chat_id)
+            return settings
+
+    def set(self, chat_id, key_path, new_value):
+        """Sets a setting (e.g. "SPREADSHEET.SPREADSHEET_ID") for a chat only."""
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute(
+                    "INSERT INTO profiles (chat_id, key_path, value) VALUES (?, ?, ?) "
+                    "ON CONFLICT (chat_id, key_path) DO UPDATE SET value = excluded.value",
+                    (chat_id, key_path, json.dumps(new_value)))
+            self._cache.pop(chat_id, None)
+
+    def reset(self, chat_id, key_path=None):
+        """Drops a setting (or all of them) of a chat, which goes back to the global default."""
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                if key_path is None:
+                    connection.execute("DELETE FROM profiles WHERE chat_id = ?", (chat_id,))
+                else:
+                    connection.execute("DELETE FROM profiles WHERE chat_id = ? AND key_path = ?", (chat_id, key_path))
+            self._cache.pop(chat_id, None)
+
+    def invalidate(self):
+        """Forgets the resolved settings, e.g. because the global defaults changed."""
+        with self._lock:
+            self._cache.clear()
+
+
+PROFILE_STORE = ProfileStore(CONFIG['SETTINGS'].get('PROFILES_PATH', 'data/profiles.sqlite3'),
+                             cache_size=CONFIG['SETTINGS'].get('PROFILE_CACHE_SIZE', 256))
+CONFIG_STORE.subscribe(lambda key_path, new_value: PROFILE_STORE.invalidate())
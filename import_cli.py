@@ -0,0 +1,110 @@
+"""
+Bulk import of bank statement exports into the spreadsheet, without going through Telegram.
+
+The statements are parsed in parallel in a process pool, merged, deduplicated (overlapping exports contain the
+same transactions) and written with GSpreadFinanceManager in as few batched requests as the batch size allows,
+in resume mode so that the transactions already in the spreadsheet are skipped; the resume mode also sorts the
+rows of each worksheet by date, once, before writing them.
+
+Usage: python import_cli.py --bank revolut exports/ "old/*.csv" [--dry-run]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from models.transaction import Transaction
+from sheets.dedup_index import fingerprint
+from sheets.statement_formats import MIME_TYPES
+from sheets.statement_parser import StatementParser
+
+
+def find_statements(patterns):
+    """Expands directories (all the CSV and XLSX files inside them, recursively) and glob patterns into paths."""
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for extension in MIME_TYPES:
+                paths.update(glob.glob(os.path.join(pattern, '**', f'*.{extension}'), recursive=True))
+        else:
+            paths.update(glob.glob(pattern, recursive=True))
+    return sorted(paths)
+
+
+def parse_statement(path, bank):
+    return StatementParser(path, bank).read_transactions()
+
+
+def merge_statements(statements):
+    """
+    Merges the transactions of several statements, dropping those found in more than one of them. A transaction
+    appearing k times in a statement is kept as many times as in the statement where it appears the most, so that
+    repeated transactions (e.g. two equal payments on the same day) survive while overlaps are removed.
+    """
+    kept = Counter()
+    merged = []
+    for transactions in statements:
+        seen = Counter()
+        for transaction in transactions:
+            key = fingerprint(transaction.to_row(), transaction.bank)
+            seen[key] += 1
+            if seen[key] > kept[key]:
+                kept[key] += 1
+                merged.append(transaction)
+    return merged
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Import bank statement exports into the spreadsheet.")
+    parser.add_argument('paths', nargs='+', help="statement files, directories or glob patterns")
+    parser.add_argument('--bank', required=True, choices=['revolut', 'unicredit'], help="bank of the statements")
+    parser.add_argument('--chat-id', type=int, default=None,
+                        help="use the settings of this chat instead of the global ones")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="parser processes (default: CPUs)")
+    parser.add_argument('--batch-size', type=int, default=None,
+                        help="rows per write request (default: SPREADSHEET.BATCH_SIZE)")
+    parser.add_argument('--ordered', action='store_true', help="write the rows in ascending date order")
+    parser.add_argument('--dry-run', action='store_true', help="parse and merge only, report counts and timings")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    paths = find_statements(args.paths)
+    if not paths:
+        print("No statement found.")
+        return 1
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        statements = list(executor.map(parse_statement, paths, [args.bank] * len(paths)))
+    parsed_at = time.perf_counter()
+    for path, transactions in zip(paths, statements):
+        print(f"{path}: {len(transactions)} transactions")
+
+    transactions = merge_statements(statements)
+    merged_at = time.perf_counter()
+
+    parsed = sum(len(statement) for statement in statements)
+    incomes = sum(transaction.direction == Transaction.INCOME for transaction in transactions)
+    print(f"{len(paths)} statements, {parsed} transactions parsed in {parsed_at - start:.2f}s")
+    print(f"{len(transactions)} unique transactions ({parsed - len(transactions)} duplicates dropped), "
+          f"{incomes} incomes and {len(transactions) - incomes} expenses, merged in {merged_at - parsed_at:.2f}s")
+    if args.dry_run:
+        return 0
+
+    # imported here so that a dry run doesn't need the Google credentials
+    from sheets.google_sheet_manager import GSpreadFinanceManager
+    gs_manager = GSpreadFinanceManager(chat_id=args.chat_id)
+    if args.batch_size:
+        gs_manager.batch_size = args.batch_size
+    added = gs_manager.insert_transactions(transactions, resume_mode=True, ordered=args.ordered)
+    print(f"Rows written: {added} in {time.perf_counter() - merged_at:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,271 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections import Counter
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest
+from config.config import CONFIG
+from config.profiles import PROFILE_STORE
+from jobs.ledger_sync import LEDGER_SYNC
+from jobs.statement_archive import STATEMENT_ARCHIVE
+from monitoring.metrics import METRICS
+from sheets.blocking import import_blocking, run_blocking
+from sheets.import_progress import ImportProgress
+from sheets.ledger import LEDGER
+from sheets.rate_limiter import SheetsQuotaError
+
+logger = logging.getLogger(__name__)
+
+# upper bounds, in bytes, of the statement sizes the parse durations are grouped by
+SIZE_BUCKETS = ((100 * 1024, "100KB"), (1024 ** 2, "1MB"), (10 * 1024 ** 2, "10MB"), (100 * 1024 ** 2, "100MB"))
+
+
+def size_label(size):
+    """Returns the label of the size bucket of a statement of `size` bytes, e.g. "1MB" for 100KB < size <= 1MB."""
+    return next((label for limit, label in SIZE_BUCKETS if size <= limit), "+Inf")
+
+
+def timed(fn, *args):
+    """Calls `fn` and returns its result together with the seconds it took, measured in the calling thread."""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+class ImportJob(ImportProgress):
+    """
+    A statement upload waiting to be imported, or being imported, by the ImportQueue workers. The statement is
+    held in memory (`data`, the bytes of the file) and named `name` in the messages and logs. The upload is
+    identified by `upload_id`, its ID in the statement archive index, which also keys its transactions in the
+    ledger. The job tracks its own progress and the Telegram message (`message_id` in `chat_id`) that is edited
+    to show it.
+    `rows_received` is the number of new transactions committed to the ledger, None until it's known.
+    """
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    _ids = itertools.count(1)
+
+    def __init__(self, chat_id, bank, data, name, upload_id, mime_type=None):
+        self.id = next(self._ids)
+        self.chat_id = chat_id
+        self.bank = bank
+        self.data = data
+        self.name = name
+        self.mime_type = mime_type
+        self.upload_id = upload_id
+        self.message_id = None
+        self.status = self.QUEUED
+        self.rows_received = None
+        self.rows_total = 0
+        self.rows_done = 0
+        self.started_at = None
+        self.wait_until = 0
+        self.result = None
+        self.error = None
+        self.task = None
+
+    @property
+    def ledger_upload(self):
+        """The key of the transactions of the upload in the ledger, unique since it's derived from `upload_id`."""
+        return f"upload-{self.upload_id}"
+
+    def rows_planned(self, count):
+        self.rows_total += count
+
+    def rows_written(self, count):
+        self.rows_done += count
+        self.wait_until = 0
+
+    def waiting(self, seconds):
+        self.wait_until = max(self.wait_until, time.monotonic() + seconds)
+
+    def describe(self):
+        """Returns the text of the progress message."""
+        if self.status == self.QUEUED:
+            return "Statement queued, the import will start soon..."
+        if self.status == self.RUNNING:
+            if self.rows_received is None:
+                return "Reading the statement..."
+            text = f"Received {self.rows_received} new transactions, {self.rows_done}/{self.rows_total} rows written"
+            wait = self.wait_until - time.monotonic()
+            if wait >= 1:
+                text += f", waiting for quota {wait:.0f}s"
+            return text
+        if self.status == self.DONE:
+            if len(self.result) == 1:  # non-split mode
+                return f"Spreadsheet updated successfully!\nNumber of transaction added: {self.result[0]}"
+            return (f"Spreadsheet updated successfully!\nNumber of transaction added:\n\n"
+                    f"Incomes {self.result[0]}\nExpenses {self.result[1]}")
+        if self.status == self.CANCELLED:
+            return f"Import cancelled, {self.rows_done}/{self.rows_total} rows written."
+        return f"Import failed after {self.rows_done}/{self.rows_total} rows: {self.error}"
+
+
+class ImportQueue:
+    """
+    Runs the statement imports in the background: uploads are queued with `submit` and processed by `workers`
+    asyncio tasks, so the handlers return immediately and bursts of uploads are absorbed by the queue. Each job
+    keeps a single Telegram message up to date with its progress, edited at most every `update_interval` seconds.
+
+    An import commits the transactions of the statement to the ledger first, and then drains the pending
+    transactions of the chat to the spreadsheet with LEDGER_SYNC: rows that can't be written (quota, outage,
+    restart) stay in the ledger and are synced later, a cancelled import drops those not written yet.
+    Statements bigger than `streaming_threshold` bytes are parsed and committed `chunk_size` rows at a time.
+    """
+    def __init__(self, workers=2, update_interval=3, streaming_threshold=5 * 1024 * 1024, chunk_size=1000):
+        self.workers = workers
+        self.update_interval = update_interval
+        self.streaming_threshold = streaming_threshold
+        self.chunk_size = chunk_size
+        self.bot = None
+        self._queue = asyncio.Queue()
+        self._jobs = {}
+        self._tasks = []
+
+    def start(self, bot: Bot):
+        """Starts the workers, must be called from the running event loop."""
+        self.bot = bot
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, job):
+        """Queues a job and sends its progress message."""
+        self._jobs[job.id] = job
+        message = await self.bot.send_message(job.chat_id, job.describe())
+        job.message_id = message.message_id
+        await self._queue.put(job)
+
+    def jobs_for_chat(self, chat_id):
+        """Returns the queued and running jobs of a chat, the running one first."""
+        jobs = [job for job in self._jobs.values() if job.chat_id == chat_id]
+        return sorted(jobs, key=lambda job: (job.status != ImportJob.RUNNING, job.id))
+
+    def cancel(self, chat_id):
+        """Cancels the running (or else the first queued) job of a chat. Returns the job, or None if there's none."""
+        jobs = self.jobs_for_chat(chat_id)
+        if not jobs:
+            return None
+        job = jobs[0]
+        if job.task is not None:
+            # rows already sent to Google are kept, the import stops before the next request
+            job.task.cancel()
+        else:
+            job.status = ImportJob.CANCELLED
+            self._jobs.pop(job.id, None)
+        return job
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._process(job)
+            except Exception:
+                # a failure to record or report a job must not stop the worker, the next jobs are processed anyway
+                logger.exception("Processing of the import job of %s failed", job.name)
+            finally:
+                self._jobs.pop(job.id, None)
+                job.data = None  # the statement may be big, don't keep it around
+                self._queue.task_done()
+
+    async def _process(self, job):
+        if job.status == ImportJob.CANCELLED:
+            await self._record_result(job)
+            await self._update_message(job)
+            return
+        job.status = ImportJob.RUNNING
+        job.started_at = time.monotonic()
+        job.task = asyncio.create_task(self._run(job))
+        reporter = asyncio.create_task(self._report_progress(job))
+        try:
+            await asyncio.wait({job.task})
+        finally:
+            reporter.cancel()
+        self._finish(job)
+        self._record_metrics(job)
+        if job.status == ImportJob.CANCELLED:
+            await run_blocking(LEDGER.discard, job.ledger_upload)
+        await self._record_result(job)
+        await self._update_message(job)
+
+    async def _run(self, job):
+        statement_parser = await import_blocking('sheets.statement_parser')
+        reader = statement_parser.StatementParser(job.data, job.bank, job.mime_type)
+        spreadsheet_id = PROFILE_STORE.settings(job.chat_id)['SPREADSHEET']['SPREADSHEET_ID']
+        if len(job.data) > self.streaming_threshold:
+            # chunks come in the order of the statement (newest first for Unicredit): it doesn't matter, the
+            # ledger hands the pending transactions to the sync ordered by date, whatever the order they were added
+            received, seen, parse_time = 0, Counter(), 0
+            chunks = reader.iter_transactions(self.chunk_size)
+            while True:
+                chunk, elapsed = await run_blocking(timed, next, chunks, None)
+                parse_time += elapsed
+                if chunk is None:
+                    break
+                received += await run_blocking(LEDGER.add, job.chat_id, spreadsheet_id, job.ledger_upload, chunk,
+                                             seen)
+        else:
+            transactions, parse_time = await run_blocking(timed, reader.read_transactions)
+            received = await run_blocking(LEDGER.add, job.chat_id, spreadsheet_id, job.ledger_upload,
+                                        transactions)
+        METRICS.observe('statement_parse_seconds', parse_time, bank=job.bank, size=size_label(len(job.data)))
+        job.rows_received = received
+        await self._update_message(job)
+        return await LEDGER_SYNC.drain(job.chat_id, spreadsheet_id, progress=job, upload=job.ledger_upload)
+
+    def _finish(self, job):
+        if job.task.cancelled():
+            job.status = ImportJob.CANCELLED
+            return
+        error = job.task.exception()
+        if error is None:
+            job.status = ImportJob.DONE
+            job.result = job.task.result()
+            return
+        job.status = ImportJob.FAILED
+        if isinstance(error, SheetsQuotaError):
+            job.error = "Google Sheets quota exceeded, the remaining rows are saved and will be written automatically."
+        else:
+            logger.error("Import of %s failed", job.name, exc_info=error)
+            job.error = str(error)
+
+    @staticmethod
+    def _record_metrics(job):
+        METRICS.inc('imports_total', bank=job.bank, status=job.status)
+        METRICS.observe('import_seconds', time.monotonic() - job.started_at, bank=job.bank)
+        METRICS.observe('import_rows_written', job.rows_done, bank=job.bank)
+
+    @staticmethod
+    async def _record_result(job):
+        await run_blocking(STATEMENT_ARCHIVE.record_result, job.upload_id, job.status, job.result)
+
+    async def _report_progress(self, job):
+        while True:
+            await asyncio.sleep(self.update_interval)
+            await self._update_message(job)
+
+    async def _update_message(self, job):
+        try:
+            await self.bot.edit_message_text(job.describe(), chat_id=job.chat_id, message_id=job.message_id)
+        except TelegramBadRequest:
+            pass  # the text didn't change since the last update, or the message was deleted
+        except TelegramAPIError as error:
+            # flood control, network error...: the progress message is best effort, the next update will retry
+            logger.warning("Progress message of the import of %s not updated: %s", job.name, error)
+
+
+IMPORT_QUEUE = ImportQueue(
+    workers=CONFIG['SETTINGS'].get('IMPORT_WORKERS', 2),
+    update_interval=CONFIG['SETTINGS'].get('PROGRESS_UPDATE_INTERVAL', 3),
+    streaming_threshold=CONFIG['SETTINGS'].get('STREAMING_THRESHOLD_BYTES', 5 * 1024 * 1024),
+    chunk_size=CONFIG['SETTINGS'].get('STREAMING_CHUNK_SIZE', 1000),
+)
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+from collections import defaultdict
+from config.config import CONFIG
+from sheets.blocking import import_blocking, run_blocking
+from sheets.ledger import LEDGER
+
+logger = logging.getLogger(__name__)
+
+
+class LedgerSync:
+    """
+    Drains the transactions pending in the ledger to the spreadsheets. The import jobs drain their own chat
+    right after committing a statement; besides that, a background task retries every `interval` seconds the
+    chats left with pending rows (Google outage, quota exceeded, bot restarted mid-import), and drops the rows
+    synced more than `retention_days` days ago (0 keeps them forever).
+
+    An import job drains only the rows of its own upload, so that what it reports is what it wrote. The
+    background task drains every pending row of a chat, `batch_size` rows at a time, so the rows of several
+    uploads waiting for the quota are coalesced into the same requests; rows committed for a spreadsheet the
+    chat has since left are written to that spreadsheet, the one they were meant for. The drains of a chat
+    are serialized, and the rows are written in resume mode, so a row is never written twice even if the bot
+    stops between writing a batch and marking it synced.
+    """
+    def __init__(self, ledger, interval=60, batch_size=5000, retention_days=30):
+        self.ledger = ledger
+        self.interval = interval
+        self.batch_size = batch_size
+        self.retention_days = retention_days
+        self._locks = defaultdict(asyncio.Lock)
+        self._task = None
+
+    def start(self):
+        """Starts the background task, must be called from the running event loop."""
+        self._task = asyncio.create_task(self._worker())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def drain(self, chat_id, spreadsheet_id=None, progress=None, upload=None) -> []:
+        """
+        Writes the pending transactions of a chat to `spreadsheet_id` (by default, the chat's spreadsheet); only
+        those of `upload` if given. Returns the number of rows added to each worksheet, like
+        `insert_incomes_and_expenses`.
+
+        Raises:
+        - SheetsQuotaError, APIError: As AsyncGSpreadFinanceManager; the rows not written yet stay pending.
+        """
+        async with self._locks[chat_id]:
+            async_sheet_manager = await import_blocking('sheets.async_sheet_manager')
+            gs_manager = await async_sheet_manager.AsyncGSpreadFinanceManager.create(
+                progress=progress, chat_id=chat_id, spreadsheet_id=spreadsheet_id)
+            manager = gs_manager.manager
+            added = [0] * len(manager._target_sheets())
+            while pending := await run_blocking(self.ledger.pending, chat_id, manager.spreadsheet_id, self.batch_size,
+                                                upload):
+                by_bank = defaultdict(list)
+                for _, bank, direction, row in pending:
+                    by_bank[bank].append((row, direction))
+                for bank, rows in by_bank.items():
+                    counts = await gs_manager._insert_partitions(manager._partition(rows), resume_mode=True,
+                                                                 ordered=False, bulk=True, bank=bank)
+                    added = [total + count for total, count in zip(added, counts)]
+                await run_blocking(self.ledger.mark_synced, [id for id, _, _, _ in pending])
+            return added
+
+    async def _worker(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            for chat_id, spreadsheet_id in await run_blocking(self.ledger.pending_chats):
+                if self._locks[chat_id].locked():
+                    continue  # an import of the chat is draining it right now
+                try:
+                    await self.drain(chat_id, spreadsheet_id)
+                except Exception:
+                    logger.exception("Sync of the pending transactions of chat %s failed", chat_id)
+            if self.retention_days:
+                try:
+                    await run_blocking(self.ledger.prune, self.retention_days)
+                except Exception:
+                    logger.exception("Pruning of the ledger failed")
+
+
+LEDGER_SYNC = LedgerSync(
+    LEDGER,
+    interval=CONFIG['SETTINGS'].get('LEDGER_SYNC_INTERVAL', 60),
+    batch_size=CONFIG['SETTINGS'].get('LEDGER_BATCH_SIZE', 5000),
+    retention_days=CONFIG['SETTINGS'].get('LEDGER_RETENTION_DAYS', 30),
+)
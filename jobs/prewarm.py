@@ -0,0 +1,31 @@
+import asyncio
+import logging
+import time
+from monitoring.metrics import METRICS
+from sheets.blocking import import_blocking
+
+logger = logging.getLogger(__name__)
+
+# the modules pulling in the heavy dependencies (pandas, numpy, openpyxl, gspread, google-auth), which the bot
+# imports lazily on the first upload or import
+HEAVY_MODULES = (
+    'sheets.statement_parser',
+    'sheets.async_sheet_manager',
+)
+
+
+async def prewarm(delay=5, modules=HEAVY_MODULES):
+    """
+    Imports the heavy modules in the background, `delay` seconds after being started, so that the bot answers
+    its first commands right away and the first upload doesn't pay for the imports either. The imports run in
+    the thread pool; the duration of each one is recorded in the metrics.
+    """
+    await asyncio.sleep(delay)
+    for name in modules:
+        start = time.perf_counter()
+        try:
+            await import_blocking(name)
+        except Exception:
+            logger.exception("Pre-warming of %s failed, it will be imported on first use", name)
+            continue
+        METRICS.observe('prewarm_import_seconds', time.perf_counter() - start, module=name)
@@ -0,0 +1,166 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from config.config import CONFIG
+from config.database import connect
+from sheets.blocking import run_blocking
+
+logger = logging.getLogger(__name__)
+
+
+class StatementArchive:
+    """
+    A content-addressed archive of the uploaded statements, with an index of the uploads.
+
+    Statements are stored once per content, named after their SHA-256 and gzip-compressed, under the saving
+    folder of the chat that first uploaded them; an upload of the same file, by any chat, only adds a row to the
+    index. The index, a SQLite database at `index_path`, links each upload to its chat, time, spreadsheet and
+    import result, so that re-uploading a statement already imported into the same spreadsheet can be skipped
+    without parsing it nor touching the sheet.
+
+    Stored statements older than `retention_days` (0 keeps them forever) are deleted, as are the least recently
+    used ones while the archive takes more than `max_bytes` (0 for no limit). Storing is an optional step, run
+    in the background off the request path: `submit` returns immediately and the file is written in the shared
+    thread pool.
+    """
+    def __init__(self, index_path, max_bytes=0, retention_days=0):
+        self.index_path = index_path
+        self.max_bytes = max_bytes
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self._connection = None
+        self._tasks = set()
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = connect(
+                self.index_path,
+                "CREATE TABLE IF NOT EXISTS blobs ("
+                "sha256 TEXT PRIMARY KEY, path TEXT NOT NULL, size INTEGER NOT NULL, stored_size INTEGER NOT NULL, "
+                "last_used REAL NOT NULL)",
+                "CREATE TABLE IF NOT EXISTS uploads ("
+                "id INTEGER PRIMARY KEY, sha256 TEXT NOT NULL, chat_id INTEGER NOT NULL, name TEXT NOT NULL, "
+                "spreadsheet_id TEXT, uploaded_at TEXT NOT NULL, status TEXT NOT NULL, result TEXT)",
+                "CREATE INDEX IF NOT EXISTS uploads_sha256 ON uploads (sha256, chat_id)",
+            )
+        return self._connection
+
+    def register(self, chat_id, name, spreadsheet_id, data):
+        """
+        Records an upload in the index, unless the same statement has already been imported successfully into
+        the same spreadsheet by the chat.
+
+        Returns:
+        - tuple: (upload ID, SHA-256 of the statement, None) for a new upload, or (None, SHA-256, upload time of
+          the previous import) if the upload can be skipped.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            connection = self._connect()
+            previous = connection.execute(
+                "SELECT uploaded_at FROM uploads WHERE sha256 = ? AND chat_id = ? AND spreadsheet_id = ? "
+                "AND status = 'done' ORDER BY id DESC LIMIT 1", (digest, chat_id, spreadsheet_id)).fetchone()
+            if previous is not None:
+                return None, digest, previous[0]
+            with connection:
+                cursor = connection.execute(
+                    "INSERT INTO uploads (sha256, chat_id, name, spreadsheet_id, uploaded_at, status) "
+                    "VALUES (?, ?, ?, ?, ?, 'queued')",
+                    (digest, chat_id, name, spreadsheet_id, datetime.now().isoformat(timespec='seconds')))
+            return cursor.lastrowid, digest, None
+
+    def record_result(self, upload_id, status, result=None):
+        """Records the outcome of the import of an upload (see ImportJob's statuses) and its result."""
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("UPDATE uploads SET status = ?, result = ? WHERE id = ?",
+                                   (status, json.dumps(result), upload_id))
+
+    def forget_imports(self, chat_id, spreadsheet_id):
+        """
+        Marks the successful imports of a chat into a spreadsheet as 'reindexed', so that uploading those
+        statements again imports them instead of being skipped. Returns the number of uploads marked.
+        """
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                return connection.execute(
+                    "UPDATE uploads SET status = 'reindexed' WHERE chat_id = ? AND spreadsheet_id = ? "
+                    "AND status = 'done'", (chat_id, spreadsheet_id)).rowcount
+
+    def submit(self, folder, digest, data):
+        """
+        Schedules storing the statement `data` (bytes), whose SHA-256 is `digest`, in `folder` if it isn't
+        archived yet. Must be called from the running event loop.
+        """
+        task = asyncio.create_task(self._archive(folder, digest, data))
+        self._tasks.add(task)  # keeps a reference until the task is done
+        task.add_done_callback(self._tasks.discard)
+
+    async def drain(self):
+        """Waits for the pending writes, e.g. before shutting down."""
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _archive(self, folder, digest, data):
+        try:
+            await run_blocking(self.store, folder, digest, data)
+        except OSError:
+            logger.exception("Archiving of statement %s failed", digest)
+
+    def store(self, folder, digest, data):
+        """Stores a statement compressed, unless already archived, then applies the retention policy."""
+        with self._lock:
+            connection = self._connect()
+            if connection.execute("SELECT 1 FROM blobs WHERE sha256 = ?", (digest,)).fetchone() is None:
+                path = os.path.join(folder, digest[:2], f"{digest}.gz")
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                temp_path = f"{path}.tmp"
+                with gzip.open(temp_path, 'wb') as blob:
+                    blob.write(data)
+                os.replace(temp_path, path)
+                with connection:
+                    connection.execute(
+                        "INSERT INTO blobs (sha256, path, size, stored_size, last_used) VALUES (?, ?, ?, ?, ?)",
+                        (digest, path, len(data), os.path.getsize(path), time.time()))
+            else:
+                with connection:
+                    connection.execute("UPDATE blobs SET last_used = ? WHERE sha256 = ?", (time.time(), digest))
+            self._evict(connection)
+
+    def _evict(self, connection):
+        if self.retention_days:
+            self._delete(connection, connection.execute("SELECT sha256, path FROM blobs WHERE last_used < ?",
+                                                        (time.time() - self.retention_days * 86400,)).fetchall())
+        if self.max_bytes:
+            total = connection.execute("SELECT COALESCE(SUM(stored_size), 0) FROM blobs").fetchone()[0]
+            evicted = []
+            for digest, path, stored_size in connection.execute(
+                    "SELECT sha256, path, stored_size FROM blobs ORDER BY last_used").fetchall():
+                if total <= self.max_bytes:
+                    break
+                evicted.append((digest, path))
+                total -= stored_size
+            self._delete(connection, evicted)
+
+    @staticmethod
+    def _delete(connection, blobs):
+        for _, path in blobs:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        with connection:
+            connection.executemany("DELETE FROM blobs WHERE sha256 = ?", [(digest,) for digest, _ in blobs])
+
+STATEMENT_ARCHIVE = StatementArchive(
+    CONFIG['SETTINGS'].get('ARCHIVE_INDEX_PATH', 'data/archive_index.sqlite3'),
+    max_bytes=CONFIG['SETTINGS'].get('ARCHIVE_MAX_BYTES', 0),
+    retention_days=CONFIG['SETTINGS'].get('ARCHIVE_RETENTION_DAYS', 0),
+)
@@ -3,18 +3,51 @@ import logging
 
 from aiogram import Bot
 from aiogram import Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 
 from config.config import CONFIG
+from jobs.import_jobs import IMPORT_QUEUE
+from jobs.ledger_sync import LEDGER_SYNC
+from jobs.prewarm import prewarm
+from jobs.statement_archive import STATEMENT_ARCHIVE
+from monitoring.metrics_server import METRICS_SERVER
 from routers import router as main_router
+from routers.middlewares import ProfilingMiddleware
+from webhook.server import WEBHOOK_SERVER
 
 
 async def main():
     dp = Dispatcher()
     dp.include_router(main_router)
+    # on the updates themselves, so that every kind of update is timed, even those matching no handler
+    dp.update.outer_middleware(ProfilingMiddleware())
 
     logging.basicConfig(level=logging.INFO)
-    bot = Bot(token=CONFIG['TELEGRAM']['TELEGRAM_TOKEN'])
-    await dp.start_polling(bot)
+    # a local Bot API server, or the fake one of the load tests, can replace api.telegram.org
+    api_server = CONFIG['TELEGRAM'].get('API_SERVER')
+    session = AiohttpSession(api=TelegramAPIServer.from_base(api_server)) if api_server else None
+    bot = Bot(token=CONFIG['TELEGRAM']['TELEGRAM_TOKEN'], session=session)
+    IMPORT_QUEUE.start(bot)
+    LEDGER_SYNC.start()
+    await METRICS_SERVER.start()
+    prewarm_task = None
+    if CONFIG['SETTINGS'].get('PREWARM_IMPORTS', True):
+        prewarm_task = asyncio.create_task(prewarm(CONFIG['SETTINGS'].get('PREWARM_DELAY', 5)))
+    try:
+        if CONFIG['TELEGRAM'].get('MODE', 'polling') == 'webhook':
+            await WEBHOOK_SERVER.run(dp, bot)
+        else:
+            # getUpdates fails while a webhook is set, e.g. left over from a previous run in webhook mode
+            await bot.delete_webhook()
+            await dp.start_polling(bot)
+    finally:
+        if prewarm_task is not None:
+            prewarm_task.cancel()
+        await IMPORT_QUEUE.stop()
+        await LEDGER_SYNC.stop()
+        await STATEMENT_ARCHIVE.drain()
+        await METRICS_SERVER.stop()
 
 
 if __name__ == "__main__":
@@ -1,4 +1,7 @@
 class TransactionRevolut:
+    __slots__ = ('type', 'product', 'started_date', 'completed_date', 'description', 'amount', 'fee', 'currency',
+                 'state', 'balance')
+
     def __init__(self, type, product, started_date, completed_date, description, amount, fee, currency, state, balance):
         self.type = type
         self.product = product
@@ -0,0 +1,69 @@
+ISO_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+# digits of the minor unit of the currencies that don't have cents; every other currency is assumed to have 2
+CURRENCY_EXPONENTS = {
+    'JPY': 0,
+    'KRW': 0,
+    'HUF': 0,
+    'ISK': 0,
+    'BHD': 3,
+    'KWD': 3,
+    'OMR': 3,
+    'TND': 3,
+}
+
+
+def currency_exponent(currency):
+    return CURRENCY_EXPONENTS.get(currency, 2)
+
+
+class Transaction:
+    """
+    The canonical representation of a transaction, emitted by every statement parser and consumed by every sink.
+
+    - timestamp (datetime): When the transaction happened (started, for Revolut), None if unknown.
+    - amount (int): The signed amount in minor units of the currency (e.g. cents), so no float rounding happens.
+    - currency (str): The ISO code of the currency.
+    - direction (str): Transaction.INCOME or Transaction.EXPENSE.
+    - description (str): The description given by the bank.
+    - bank (str): The bank of the statement ('revolut' or 'unicredit').
+    - extra (tuple): The bank-specific fields needed to rebuild the spreadsheet row of the bank, see `to_row`.
+
+    Instances are slotted, without a per-instance `__dict__`, to keep large statements compact in memory.
+    """
+    __slots__ = ('timestamp', 'amount', 'currency', 'direction', 'description', 'bank', 'extra')
+
+    INCOME = 'income'
+    EXPENSE = 'expense'
+
+    def __init__(self, timestamp, amount, currency, direction, description, bank, extra=()):
+        self.timestamp = timestamp
+        self.amount = amount
+        self.currency = currency
+        self.direction = direction
+        self.description = description
+        self.bank = bank
+        self.extra = extra
+
+    @property
+    def amount_value(self):
+        """The amount in major units of the currency (e.g. euros), as written to the spreadsheet."""
+        if self.amount is None:
+            return None
+        return self.amount / 10 ** currency_exponent(self.currency)
+
+    def to_row(self):
+        """
+        Returns the spreadsheet row of the transaction, laid out like the statements of its bank:
+        - revolut: started date, completed date, type, product, description, amount, fee, currency, state, balance
+        - unicredit: date, description, amount, currency
+        """
+        timestamp = self.timestamp.strftime(ISO_FORMAT) if self.timestamp is not None else None
+        if self.bank == 'revolut':
+            completed_date, type, product, fee, state, balance = self.extra
+            return [timestamp, completed_date, type, product, self.description, self.amount_value, fee, self.currency,
+                    state, balance]
+        return [timestamp, self.description, self.amount_value, self.currency]
+
+    def __repr__(self):
+        return f"Transaction(timestamp={self.timestamp}, amount={self.amount}, currency={self.currency}, direction={self.direction}, description={self.description}, bank={self.bank})"
@@ -1,4 +1,6 @@
 class TransactionUnicredit:
+    __slots__ = ('data', 'description', 'importo', 'currency')
+
     def __init__(self, data, description, importo, currency):
         self.data = data
         self.description = description
@@ -0,0 +1,94 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Metrics:
+    """
+    An in-process registry of the counters and timings of the bot, recorded from the hot paths (handlers, statement
+    parsing, Google Sheets requests, quota waits, imports) and exposed in the Prometheus text format by the
+    metrics server, or as plain text by the /stats command.
+
+    Two kinds of metrics are kept, identified by a name and a set of labels:
+    - counters, only incremented with `inc` (e.g. requests made, seconds spent waiting);
+    - summaries, fed with `observe` or `timer`, of which the count, the sum and the maximum are kept.
+
+    Recording is a dictionary update under a lock, cheap enough to be done on every request, from any thread.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._summaries = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        """Adds `value` to a counter."""
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """Records a value (e.g. a duration in seconds, a number of rows) in a summary."""
+        key = self._key(name, labels)
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                self._summaries[key] = [1, value, value]
+            else:
+                summary[0] += 1
+                summary[1] += value
+                summary[2] = max(summary[2], value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Records in a summary the seconds spent in the `with` block, even if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        """Returns a copy of the counters and of the summaries, as {(name, labels): value} dictionaries."""
+        with self._lock:
+            return dict(self._counters), {key: tuple(summary) for key, summary in self._summaries.items()}
+
+    @staticmethod
+    def _format_labels(labels, **extra):
+        labels = labels + tuple(extra.items())
+        if not labels:
+            return ""
+        return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+    def render_prometheus(self):
+        """Returns every metric in the Prometheus text exposition format."""
+        counters, summaries = self.snapshot()
+        lines = []
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f"# TYPE {name} counter")
+            lines.extend(f"{name}{self._format_labels(labels)} {value}"
+                         for (metric, labels), value in sorted(counters.items()) if metric == name)
+        for name in sorted({name for name, _ in summaries}):
+            lines.append(f"# TYPE {name} summary")
+            for (metric, labels), (count, total, _) in sorted(summaries.items()):
+                if metric == name:
+                    lines.append(f"{name}_count{self._format_labels(labels)} {count}")
+                    lines.append(f"{name}_sum{self._format_labels(labels)} {total}")
+            lines.append(f"# TYPE {name}_max gauge")
+            lines.extend(f"{name}_max{self._format_labels(labels)} {maximum}"
+                         for (metric, labels), (_, _, maximum) in sorted(summaries.items()) if metric == name)
+        return "\n".join(lines) + "\n"
+
+    def render_text(self):
+        """Returns every metric as short human readable lines, for the /stats command."""
+        counters, summaries = self.snapshot()
+        lines = [f"{name}{self._format_labels(labels)} = {value:g}" for (name, labels), value in sorted(counters.items())]
+        lines.extend(f"{name}{self._format_labels(labels)}: n={count} avg={total / count:.3g} max={maximum:.3g}"
+                     for (name, labels), (count, total, maximum) in sorted(summaries.items()))
+        return "\n".join(lines)
+
+
+METRICS = Metrics()
@@ -0,0 +1,44 @@
+import logging
+from aiohttp import web
+from config.config import CONFIG
+from monitoring.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsServer:
+    """
+    Serves the metrics in the Prometheus text format on http://`host`:`port`/metrics, from the event loop of the
+    bot. The server is not started when `port` is None; bind it to a local address, it has no authentication.
+    """
+    def __init__(self, metrics, host='127.0.0.1', port=None):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._runner = None
+
+    async def start(self):
+        """Starts listening, must be called from the running event loop."""
+        if self.port is None:
+            return
+        app = web.Application()
+        app.router.add_get('/metrics', self._handle_metrics)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info("Metrics served on http://%s:%s/metrics", self.host, self.port)
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle_metrics(self, request):
+        return web.Response(text=self.metrics.render_prometheus(), content_type='text/plain', charset='utf-8')
+
+
+METRICS_SERVER = MetricsServer(
+    METRICS,
+    host=CONFIG['SETTINGS'].get('METRICS_HOST', '127.0.0.1'),
+    port=CONFIG['SETTINGS'].get('METRICS_PORT'),
+)
@@ -0,0 +1,187 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from logging.handlers import RotatingFileHandler
+from config.config import CONFIG, CONFIG_STORE
+from monitoring.metrics import METRICS
+
+
+class UpdateTrace:
+    """
+    What is known of an update while it's being handled: its `description` (kind of update, chat, user), the
+    handler and the filters that matched it, once a handler has been selected, and the stack samples taken
+    while it was over the threshold.
+    """
+    def __init__(self, description, thread_id, task=None):
+        self.description = description
+        self.thread_id = thread_id
+        self.task = task
+        self.handler = None
+        self.filters = ()
+        self.samples = Counter()
+        self.profile = None
+        self.started_at = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started_at
+
+    def matched(self, handler, filters=()):
+        """Records the handler (its qualified name) and the filters (their representation) selected for the update."""
+        self.handler = handler
+        self.filters = tuple(filters)
+
+
+def _await_chain(task):
+    """Returns the "file:line in function" of each coroutine awaited by `task`, outermost first."""
+    lines = []
+    coroutine = task.get_coro() if task is not None else None
+    while coroutine is not None:
+        frame = getattr(coroutine, 'cr_frame', None) or getattr(coroutine, 'gi_frame', None)
+        if frame is not None:
+            lines.append(f"  {frame.f_code.co_filename}:{frame.f_lineno} in {frame.f_code.co_name}")
+        coroutine = getattr(coroutine, 'cr_await', None) or getattr(coroutine, 'gi_yieldfrom', None)
+    return "".join(line + "\n" for line in lines)
+
+
+class UpdateProfiler:
+    """
+    Traces the updates whose handling takes longer than `threshold` seconds, to find out which handler made the
+    bot "freeze". Each slow update is written to a rotating log file at `trace_path` (at most `max_bytes` bytes,
+    `backups` old files kept) with its duration, the handler and filters that matched it and what the bot was
+    doing meanwhile, according to `mode`:
+    - 'sample': a watchdog thread takes, every `sample_interval` seconds, a sample of the stack of the event loop
+      thread and of the coroutines awaited by the update. A blocked loop shows up in the thread stack, a handler
+      awaiting something slow in the coroutine chain. The overhead is nil until an update gets slow.
+    - 'cprofile': every update is run under cProfile and the statistics of the slow ones are written. The
+      profile covers everything the event loop runs meanwhile, and only one update is profiled at a time.
+
+    Nothing is traced unless `enabled`; the settings are followed live, so tracing can be switched on in
+    production (e.g. with the /profiling command, reserved to the chats of `TELEGRAM.ADMIN_CHAT_IDS`) without
+    restarting the bot.
+    """
+    SAMPLE = 'sample'
+    CPROFILE = 'cprofile'
+
+    def __init__(self, enabled=False, mode=SAMPLE, threshold=2.0, sample_interval=0.5,
+                 trace_path='logs/slow_updates.log', max_bytes=10 * 1024 * 1024, backups=5, max_samples=20):
+        self.enabled = enabled
+        self.mode = mode
+        self.threshold = threshold
+        self.sample_interval = sample_interval
+        self.trace_path = trace_path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.max_samples = max_samples
+        self._active = {}
+        self._profiling = False
+        self._lock = threading.Lock()
+        self._watchdog = None
+        self._logger = None
+
+    def start(self, description, task=None):
+        """Starts tracing an update handled by the current thread, returns the trace or None if tracing is off."""
+        if not self.enabled:
+            return None
+        trace = UpdateTrace(description, threading.get_ident(), task)
+        with self._lock:
+            self._active[id(trace)] = trace
+            if self.mode == self.CPROFILE and not self._profiling:
+                self._profiling = True
+                trace.profile = cProfile.Profile()
+        if trace.profile is not None:
+            trace.profile.enable()
+        if self.mode == self.SAMPLE:
+            self._ensure_watchdog()
+        return trace
+
+    def finish(self, trace):
+        """Stops tracing an update, writing the trace to the log file if it was slow."""
+        elapsed = trace.elapsed
+        if trace.profile is not None:
+            trace.profile.disable()
+        with self._lock:
+            self._active.pop(id(trace), None)
+            if trace.profile is not None:
+                self._profiling = False
+        if elapsed >= self.threshold:
+            METRICS.inc('slow_updates_total', handler=trace.handler or "unhandled")
+            self._trace_logger().warning(self._format(trace, elapsed))
+
+    def _ensure_watchdog(self):
+        with self._lock:
+            if self._watchdog is None:
+                self._watchdog = threading.Thread(target=self._watch, name="update-watchdog", daemon=True)
+                self._watchdog.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.sample_interval)
+            # sampled under the lock, so that a finished trace is never changed while it's being written
+            with self._lock:
+                traces = [trace for trace in self._active.values() if self.mode == self.SAMPLE
+                          and trace.elapsed >= self.threshold and sum(trace.samples.values()) < self.max_samples]
+                if not traces:
+                    continue
+                frames = sys._current_frames()
+                for trace in traces:
+                    frame = frames.get(trace.thread_id)
+                    thread_stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+                    trace.samples[(thread_stack, _await_chain(trace.task))] += 1
+
+    def _format(self, trace, elapsed):
+        text = io.StringIO()
+        text.write(f"Slow update ({elapsed:.2f}s): {trace.description}\n")
+        text.write(f"Handler: {trace.handler or 'none matched'}\n")
+        for matched_filter in trace.filters:
+            text.write(f"Filter: {matched_filter}\n")
+        for (thread_stack, await_chain), count in trace.samples.most_common():
+            text.write(f"--- {count} sample(s), event loop thread:\n{thread_stack}")
+            if await_chain:
+                text.write(f"--- awaiting:\n{await_chain}")
+        if trace.profile is not None:
+            text.write("--- profile:\n")
+            pstats.Stats(trace.profile, stream=text).sort_stats('cumulative').print_stats(30)
+        return text.getvalue()
+
+    def _trace_logger(self):
+        if self._logger is None:
+            folder = os.path.dirname(self.trace_path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+            handler = RotatingFileHandler(self.trace_path, maxBytes=self.max_bytes, backupCount=self.backups)
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            logger = logging.getLogger(f"{__name__}.traces")
+            logger.addHandler(handler)
+            logger.propagate = False  # traces are long, keep them out of the console
+            self._logger = logger
+        return self._logger
+
+    def configure(self, key_path, new_value):
+        """Follows the changes of the profiling settings, subscribed to the configuration store."""
+        attributes = {
+            'SETTINGS.PROFILING_ENABLED': 'enabled',
+            'SETTINGS.PROFILING_MODE': 'mode',
+            'SETTINGS.PROFILING_SLOW_THRESHOLD': 'threshold',
+        }
+        setattr(self, attributes[key_path], new_value)
+
+
+UPDATE_PROFILER = UpdateProfiler(
+    enabled=CONFIG['SETTINGS'].get('PROFILING_ENABLED', False),
+    mode=CONFIG['SETTINGS'].get('PROFILING_MODE', UpdateProfiler.SAMPLE),
+    threshold=CONFIG['SETTINGS'].get('PROFILING_SLOW_THRESHOLD', 2.0),
+    sample_interval=CONFIG['SETTINGS'].get('PROFILING_SAMPLE_INTERVAL', 0.5),
+    trace_path=CONFIG['SETTINGS'].get('PROFILING_TRACE_PATH', 'logs/slow_updates.log'),
+    max_bytes=CONFIG['SETTINGS'].get('PROFILING_TRACE_MAX_BYTES', 10 * 1024 * 1024),
+    backups=CONFIG['SETTINGS'].get('PROFILING_TRACE_BACKUPS', 5),
+)
+CONFIG_STORE.subscribe(UPDATE_PROFILER.configure, 'SETTINGS.PROFILING_ENABLED', 'SETTINGS.PROFILING_MODE',
+                       'SETTINGS.PROFILING_SLOW_THRESHOLD')
@@ -3,6 +3,7 @@ __all__ = ("router",)
 from aiogram import Router
 from .commands import router as commands_router
 from .common import router as common_router
+from .middlewares import HandlerMetricsMiddleware
 
 router = Router(name=__name__)
 
@@ -10,4 +11,7 @@ router.include_routers(
     commands_router,
 )
 
-router.include_router(common_router)
\ No newline at end of file
+router.include_router(common_router)
+
+# inner middlewares of a router also wrap the handlers of its nested routers
+router.message.middleware(HandlerMetricsMiddleware())
@@ -1,6 +1,7 @@
 __all__ = ("router",)
 
 from aiogram import Router
+from .admin_commands import router as admin_commands_router
 from .base_commands import router as base_commands_router
 from .settings_commands import router as settings_commands_router
 
@@ -8,5 +9,6 @@ router = Router(name=__name__)
 
 router.include_routers(
     base_commands_router,
+    admin_commands_router,
     settings_commands_router,
 )
\ No newline at end of file
@@ -0,0 +1,58 @@
+import logging
+from aiogram import Router, types
+from aiogram.filters import Command, CommandObject
+
+from config.config import CONFIG, CONFIG_STORE
+from monitoring.metrics import METRICS
+from monitoring.profiling import UPDATE_PROFILER
+
+logger = logging.getLogger(__name__)
+
+router = Router(name=__name__)
+
+# Telegram refuses messages longer than this
+MAX_MESSAGE_LENGTH = 4096
+
+
+async def check_admin(message: types.Message) -> bool:
+    """Tells whether the chat may use the admin commands, answering it if not."""
+    # closed by default: with an empty list of admins no chat may use the commands
+    admins = CONFIG['TELEGRAM'].get('ADMIN_CHAT_IDS', [])
+    if message.chat.id not in admins:
+        if not admins:
+            logger.warning("Admin command refused to chat %s: TELEGRAM.ADMIN_CHAT_IDS is empty", message.chat.id)
+        await message.answer("This command is reserved to the administrators of the bot.")
+        return False
+    return True
+
+
+@router.message(Command("stats", prefix="!/"))
+async def handle_stats_command(message: types.Message):
+    if not await check_admin(message):
+        return
+    text = METRICS.render_text() or "No metrics recorded yet."
+    await message.answer(text=text[:MAX_MESSAGE_LENGTH], parse_mode=None)
+
+
+@router.message(Command("profiling", prefix="!/"))
+async def handle_profiling_command(message: types.Message, command: CommandObject):
+    if not await check_admin(message):
+        return
+    argument = (command.args or "").strip().lower()
+    try:
+        if argument in ("on", "off"):
+            CONFIG_STORE.set('SETTINGS.PROFILING_ENABLED', argument == "on")
+        elif argument in (UPDATE_PROFILER.SAMPLE, UPDATE_PROFILER.CPROFILE):
+            CONFIG_STORE.set('SETTINGS.PROFILING_MODE', argument)
+        elif argument:
+            CONFIG_STORE.set('SETTINGS.PROFILING_SLOW_THRESHOLD', float(argument))
+    except ValueError:
+        await message.answer("Usage: /profiling [on | off | sample | cprofile | <slow threshold in seconds>]")
+        return
+    except OSError as e:
+        await message.answer(f"The setting is applied but couldn't be saved: {e}")
+    await message.answer(
+        text=f"Profiling {'on' if UPDATE_PROFILER.enabled else 'off'}, mode {UPDATE_PROFILER.mode}, "
+             f"updates slower than {UPDATE_PROFILER.threshold:g}s are traced to {UPDATE_PROFILER.trace_path}",
+        parse_mode=None,
+    )
@@ -1,5 +1,4 @@
 import datetime
-import os
 from aiogram import F, Router, types, Bot
 from aiogram.enums import ParseMode
 from aiogram.filters import CommandStart, Command
@@ -9,10 +8,13 @@ from aiogram.types import ReplyKeyboardRemove
 from aiogram.utils import markdown
 
 from keyboards.common_keyboards import *
-from sheets.statement_parser import StatementParser
-from sheets.google_sheet_manager import GSpreadFinanceManager
-import config.config as config
-import importlib
+from jobs.import_jobs import IMPORT_QUEUE, ImportJob
+from jobs.statement_archive import STATEMENT_ARCHIVE
+from sheets.blocking import run_blocking
+from sheets.dedup_index import DEDUP_INDEX
+from sheets.ledger import LEDGER
+from config.profiles import PROFILE_STORE
+from sheets.statement_formats import MIME_TYPES
 
 router = Router(name=__name__)
 
@@ -77,20 +79,20 @@ async def handle_help_command(message: types.Message):
 @router.message(Command("settings", prefix="!/"))
 async def handle_help_command(message: types.Message):
     markup = get_settings_kb()
-    importlib.reload(config)
+    settings = PROFILE_STORE.settings(message.chat.id)
     await message.answer(
         text=f"<b>YOUR CURRENT SETTINGS:</b>\n\n"
-             f"<b>Saving path for statement</b> → <code>{config.CONFIG['SETTINGS']['ATTACH_SAVING_PATH']}</code>\n"
-             f"<b>Service account file</b> → <code>{config.CONFIG['SPREADSHEET']['SERVICE_ACCOUNT_FILE']}</code>\n"
-             f"<b>Spreadsheet ID</b> → <code>{config.CONFIG['SPREADSHEET']['SPREADSHEET_ID']}</code>\n"
-             f"<b>Worksheet income name</b> → <code>{config.CONFIG['SPREADSHEET']['WORKSHEET_INCOME_NAME']}</code>\n"
-             f"<b>Worksheet expenses name</b> → <code>{config.CONFIG['SPREADSHEET']['WORKSHEET_EXPENSES_NAME']}</code>\n"
-             f"<b>Skip statement first line</b> → <code>{config.CONFIG['SPREADSHEET']['SKIP_STATEMENT_FIRSTLINE']}</code>\n"
-             f"<b>Income start row</b> → <code>{config.CONFIG['SPREADSHEET']['INCOME_START_ROW']}</code>\n"
-             f"<b>Expenses start row</b> → <code>{config.CONFIG['SPREADSHEET']['EXPENSES_START_ROW']}</code>\n"
-             f"<b>Split income and expenses</b> → <code>{config.CONFIG['SPREADSHEET']['SPLIT_INCOME_EXPENSES']}</code>\n"
-             f"<b>Retry delay</b> → <code>{config.CONFIG['SPREADSHEET']['RETRY_DELAY']}</code>\n"
-             f"<b>Max retries</b> → <code>{config.CONFIG['SPREADSHEET']['MAX_RETRIES']}</code>\n"
+             f"<b>Saving path for statement</b> → <code>{settings['SETTINGS']['ATTACH_SAVING_PATH']}</code>\n"
+             f"<b>Service account file</b> → <code>{settings['SPREADSHEET']['SERVICE_ACCOUNT_FILE']}</code>\n"
+             f"<b>Spreadsheet ID</b> → <code>{settings['SPREADSHEET']['SPREADSHEET_ID']}</code>\n"
+             f"<b>Worksheet income name</b> → <code>{settings['SPREADSHEET']['WORKSHEET_INCOME_NAME']}</code>\n"
+             f"<b>Worksheet expenses name</b> → <code>{settings['SPREADSHEET']['WORKSHEET_EXPENSES_NAME']}</code>\n"
+             f"<b>Skip statement first line</b> → <code>{settings['SPREADSHEET']['SKIP_STATEMENT_FIRSTLINE']}</code>\n"
+             f"<b>Income start row</b> → <code>{settings['SPREADSHEET']['INCOME_START_ROW']}</code>\n"
+             f"<b>Expenses start row</b> → <code>{settings['SPREADSHEET']['EXPENSES_START_ROW']}</code>\n"
+             f"<b>Split income and expenses</b> → <code>{settings['SPREADSHEET']['SPLIT_INCOME_EXPENSES']}</code>\n"
+             f"<b>Retry delay</b> → <code>{settings['SPREADSHEET']['RETRY_DELAY']}</code>\n"
+             f"<b>Max retries</b> → <code>{settings['SPREADSHEET']['MAX_RETRIES']}</code>\n"
              f"\nClick on the corresponding button to edit the value",
         parse_mode='HTML',  # with markdown there are problem with special char of SERVICE_ACCOUNT_FILE
         reply_markup=markup,
@@ -104,7 +106,7 @@ async def handle_statement_file(message: types.Message, bot: Bot, state: FSMCont
 
     mime_type = message.document.mime_type
 
-    if mime_type not in ['text/csv', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet']:
+    if mime_type not in MIME_TYPES.values():
         await message.reply("Please send a CSV or XLSX file.")
         return
 
@@ -115,30 +117,59 @@ async def handle_statement_file(message: types.Message, bot: Bot, state: FSMCont
     current_time = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     new_file_name = f"{user_full_name}_{current_time}_{file_name}"
 
-    data_folder = config.CONFIG['SETTINGS']['ATTACH_SAVING_PATH']
-    if not os.path.exists(data_folder):
-        os.makedirs(data_folder)
-
-    save_path = os.path.join(data_folder, new_file_name)
-
     file = await bot.get_file(file_id)
     file_path = file.file_path
 
-    await bot.download_file(file_path, save_path)
-    await message.answer("File received correctly! starting processing...")
+    # the statement is parsed from memory, archiving a copy on disk is optional and done in the background
+    data = (await bot.download_file(file_path)).getvalue()
+    settings = PROFILE_STORE.settings(message.chat.id)
+    upload_id, digest, imported_at = await run_blocking(STATEMENT_ARCHIVE.register, message.chat.id, new_file_name,
+                                                        settings['SPREADSHEET']['SPREADSHEET_ID'], data)
+    if upload_id is None:
+        await state.clear()
+        await message.answer(f"This statement was already imported on {imported_at}, nothing to do!",
+                             reply_markup=get_back_to_menu_kb())
+        return
+    if settings['SETTINGS'].get('ARCHIVE_STATEMENTS', True):
+        STATEMENT_ARCHIVE.submit(settings['SETTINGS']['ATTACH_SAVING_PATH'], digest, data)
+    await message.answer("File received correctly! You can follow the import below, /status and /cancel act on it.")
 
-    reader = StatementParser(save_path, state_data.get("bank"))
-    transactions = reader.read_data()  # TODO: big crash if bank wrong
+    await state.clear()
+    # TODO: big crash if bank wrong
+    job = ImportJob(message.chat.id, state_data.get("bank"), data, new_file_name, upload_id, mime_type)
+    await IMPORT_QUEUE.submit(job)
 
-    gs_manager = GSpreadFinanceManager()
 
-    # TODO: add a message when _add_row go sleep for exceed quote
-    res = gs_manager.insert_incomes_and_expenses(transactions, ordered=False, resume_mode=True)
-    await message.answer(
-        f'Spreadsheet updated successfully!\nNumber of transaction added:\n\nIncomes {res[0]}\nExpenses {res[1]}')
+@router.message(Command("status", prefix="!/"))
+async def handle_status_command(message: types.Message):
+    jobs = IMPORT_QUEUE.jobs_for_chat(message.chat.id)
+    if not jobs:
+        await message.answer("No import in progress.")
+        return
+    await message.answer("\n\n".join(job.describe() for job in jobs))
 
-    await state.clear()
-    await message.answer("file parsed correctly!")
+
+@router.message(Command("cancel", prefix="!/"))
+async def handle_cancel_command(message: types.Message):
+    job = IMPORT_QUEUE.cancel(message.chat.id)
+    if job is None:
+        await message.answer("No import to cancel.")
+        return
+    await message.answer("Import cancelled, rows already written are kept in the spreadsheet.")
+
+
+@router.message(Command("reindex", prefix="!/"))
+async def handle_reindex_command(message: types.Message):
+    # after rows were deleted from the spreadsheet by hand, lets the next uploads import them again
+    if IMPORT_QUEUE.jobs_for_chat(message.chat.id):
+        await message.answer("Wait for the import in progress to finish, or /cancel it, before reindexing.")
+        return
+    spreadsheet_id = PROFILE_STORE.settings(message.chat.id)['SPREADSHEET']['SPREADSHEET_ID']
+    await run_blocking(DEDUP_INDEX.invalidate, f"{spreadsheet_id}/")
+    await run_blocking(LEDGER.forget_synced, spreadsheet_id)
+    await run_blocking(STATEMENT_ARCHIVE.forget_imports, message.chat.id, spreadsheet_id)
+    await message.answer("The spreadsheet will be read again on the next import: statements already imported "
+                         "can be uploaded again, and only the rows missing from the spreadsheet are written.")
 
 
 # --- bank type --- TODO: improv
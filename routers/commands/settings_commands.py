@@ -1,8 +1,9 @@
+import os
 from aiogram import F, Router, types
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.types import ReplyKeyboardRemove
-from config.config import update_value
+from config.profiles import PROFILE_STORE, confine_path, path_root
 from keyboards.common_keyboards import *
 
 router = Router(name=__name__)
@@ -43,7 +44,7 @@ async def set_spreadsheet_id(message: types.Message, state: FSMContext):
         )
         return
 
-    update_value("SPREADSHEET.SPREADSHEET_ID", new_value)
+    PROFILE_STORE.set(message.chat.id, "SPREADSHEET.SPREADSHEET_ID", new_value)
     await state.clear()
     await message.answer(
         text=f"New value set correctly: {new_value}",
@@ -65,14 +66,20 @@ async def handle_attach_saving_path_btn(message: types.Message, state: FSMContex
 @router.message(Form.attach_saving_path_state)
 async def set_attach_saving_path(message: types.Message, state: FSMContext):
     new_value = message.text
-    if not new_value:  # Check for empty string or potentially validate the path
+    root = path_root("SETTINGS.ATTACH_SAVING_PATH")
+    try:
+        # several chats share the bot: a chat may only save its statements under the common root
+        new_value = confine_path(root, new_value) if new_value else None
+    except ValueError:
+        new_value = None
+    if not new_value:
         await message.answer(
-            text="The value entered does not seem correct, please try again!",
+            text=f"The value entered does not seem correct, please send a folder inside {root}!",
             reply_markup=get_back_to_menu_kb()
         )
         return
 
-    update_value("SETTINGS.ATTACH_SAVING_PATH", new_value)
+    PROFILE_STORE.set(message.chat.id, "SETTINGS.ATTACH_SAVING_PATH", new_value)
     await state.clear()
     await message.answer(
         text=f"New ATTACH_SAVING_PATH set correctly: {new_value}",
@@ -92,14 +99,20 @@ async def handle_service_account_file_btn(message: types.Message, state: FSMCont
 @router.message(Form.service_account_file_state)
 async def set_service_account_file(message: types.Message, state: FSMContext):
     new_value = message.text
-    if not new_value:  #TODO: add validation
+    root = path_root("SPREADSHEET.SERVICE_ACCOUNT_FILE")
+    try:
+        # several chats share the bot: a chat may only use the key files put in the common folder
+        new_value = confine_path(root, new_value) if new_value else None
+    except ValueError:
+        new_value = None
+    if not new_value or not os.path.isfile(new_value):
         await message.answer(
-            text="The value entered does not seem correct, please try again!",
+            text=f"The value entered does not seem correct, please send the name of a file in {root}!",
             reply_markup=get_back_to_menu_kb()
         )
         return
 
-    update_value("SPREADSHEET.SERVICE_ACCOUNT_FILE", new_value)
+    PROFILE_STORE.set(message.chat.id, "SPREADSHEET.SERVICE_ACCOUNT_FILE", new_value)
     await state.clear()
     await message.answer(
         text=f"New SERVICE_ACCOUNT_FILE set correctly: {new_value}",
@@ -128,7 +141,7 @@ async def set_worksheet_income_name(message: types.Message, state: FSMContext):
         )
         return
 
-    update_value("SPREADSHEET.WORKSHEET_INCOME_NAME", new_value)
+    PROFILE_STORE.set(message.chat.id, "SPREADSHEET.WORKSHEET_INCOME_NAME", new_value)
     await state.clear()
     await message.answer(
         text=f"New WORKSHEET_INCOME_NAME set correctly: {new_value}",
@@ -157,7 +170,7 @@ async def set_worksheet_expenses_name(message: types.Message, state: FSMContext)
         )
         return
 
-    update_value("SPREADSHEET.WORKSHEET_EXPENSES_NAME", new_value)
+    PROFILE_STORE.set(message.chat.id, "SPREADSHEET.WORKSHEET_EXPENSES_NAME", new_value)
     await state.clear()
     await message.answer(
         text=f"New WORKSHEET_EXPENSES_NAME set correctly: {new_value}",
@@ -188,7 +201,7 @@ async def set_skip_statement_firstline(message: types.Message, state: FSMContext
 
     # Converti la risposta in un valore booleano
     boolean_value = True if new_value == "yes" else False
-    update_value("SPREADSHEET.SKIP_STATEMENT_FIRSTLINE", boolean_value)
+    PROFILE_STORE.set(message.chat.id, "SPREADSHEET.SKIP_STATEMENT_FIRSTLINE", boolean_value)
     await state.clear()
     await message.answer(
         text=f"Setting to skip the first line of the statement has been set to: {'Yes' if boolean_value else 'No'}",
@@ -217,7 +230,7 @@ async def set_income_start_row(message: types.Message, state: FSMContext):
         )
         return
 
-    update_value("SPREADSHEET.INCOME_START_ROW", int(new_value))
+    PROFILE_STORE.set(message.chat.id, "SPREADSHEET.INCOME_START_ROW", int(new_value))
     await state.clear()
     await message.answer(
         text=f"New INCOME_START_ROW set correctly: {new_value}",
@@ -246,7 +259,7 @@ async def set_expenses_start_row(message: types.Message, state: FSMContext):
         )
         return
 
-    update_value("SPREADSHEET.EXPENSES_START_ROW", int(new_value))
+    PROFILE_STORE.set(message.chat.id, "SPREADSHEET.EXPENSES_START_ROW", int(new_value))
     await state.clear()
     await message.answer(
         text=f"New EXPENSES_START_ROW set correctly: {new_value}",
@@ -277,7 +290,7 @@ async def set_split_income_expenses(message: types.Message, state: FSMContext):
 
     # Converti la risposta in un valore booleano
     boolean_value = True if new_value == "yes" else False
-    update_value("SPREADSHEET.SPLIT_INCOME_EXPENSES", boolean_value)
+    PROFILE_STORE.set(message.chat.id, "SPREADSHEET.SPLIT_INCOME_EXPENSES", boolean_value)
     await state.clear()
     await message.answer(
         text=f"Setting to split income and expenses has been {'enabled' if boolean_value else 'disabled'}.",
@@ -306,7 +319,7 @@ async def set_retry_delay(message: types.Message, state: FSMContext):
         )
         return
 
-    update_value("SPREADSHEET.RETRY_DELAY", int(new_value))
+    PROFILE_STORE.set(message.chat.id, "SPREADSHEET.RETRY_DELAY", int(new_value))
     await state.clear()
     await message.answer(
         text=f"New RETRY_DELAY set correctly: {new_value} seconds",
@@ -335,7 +348,7 @@ async def set_max_retries(message: types.Message, state: FSMContext):
         )
         return
 
-    update_value("SPREADSHEET.MAX_RETRIES", int(new_value))
+    PROFILE_STORE.set(message.chat.id, "SPREADSHEET.MAX_RETRIES", int(new_value))
     await state.clear()
     await message.answer(
         text=f"New MAX_RETRIES set correctly: {new_value}",
@@ -0,0 +1,76 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import Message, TelegramObject, Update
+
+from monitoring.metrics import METRICS
+from monitoring.profiling import UPDATE_PROFILER
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Records the latency of every handler call, labelled with the router (the module defining the handler) and
+    the handler, and counts the handlers that raised. Registered as an inner middleware of the main router, it
+    runs for the handlers of all the nested routers, and only once a handler has been selected by its filters.
+    The handler and its filters are also recorded in the trace of the update, if ProfilingMiddleware made one.
+    """
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        callback = data["handler"].callback
+        labels = {"router": callback.__module__, "handler": callback.__name__}
+        trace = data.get("update_trace")
+        if trace is not None:
+            trace.matched(f"{callback.__module__}.{callback.__qualname__}",
+                          [repr(filter_object.callback) for filter_object in data["handler"].filters or ()])
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            METRICS.inc("handler_errors_total", **labels)
+            raise
+        finally:
+            METRICS.observe("handler_seconds", time.perf_counter() - start, **labels)
+
+
+def describe_update(event: TelegramObject) -> str:
+    """Returns a short description of an update for the traces, without the text of the messages."""
+    if isinstance(event, Update):
+        return f"update {event.update_id}: {describe_update(event.event)}"
+    if isinstance(event, Message):
+        text = event.text or ""
+        command = f", command {text.split()[0]}" if text.startswith(("/", "!")) else ""
+        return f"{event.content_type} message {event.message_id} in chat {event.chat.id}{command}"
+    return type(event).__name__
+
+
+class ProfilingMiddleware(BaseMiddleware):
+    """
+    Times every update, from before the filters are checked until the handler returns, and traces the slow ones
+    with UPDATE_PROFILER (see UpdateProfiler), which does nothing unless profiling is enabled in the settings.
+    Registered as an outer middleware of the dispatcher's updates, so that every kind of update (messages, edited
+    messages, callback queries...) is timed, including those matching no handler; the trace travels in the
+    `update_trace` item of the handler data.
+    """
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        start = time.perf_counter()
+        kind = type(event.event).__name__ if isinstance(event, Update) else type(event).__name__
+        trace = UPDATE_PROFILER.start(describe_update(event), asyncio.current_task())
+        if trace is not None:
+            data["update_trace"] = trace
+        try:
+            return await handler(event, data)
+        finally:
+            METRICS.observe("update_seconds", time.perf_counter() - start, event=kind)
+            if trace is not None:
+                UPDATE_PROFILER.finish(trace)
@@ -0,0 +1,163 @@
+import asyncio
+from gspread.exceptions import APIError
+from sheets.blocking import run_blocking
+from sheets.dedup_index import FINGERPRINT_COLUMNS
+from sheets.google_sheet_manager import GSpreadFinanceManager
+from sheets.import_progress import ImportProgress
+from sheets.rate_limiter import SheetsQuotaError
+
+
+class AsyncGSpreadFinanceManager:
+    """
+    An asyncio facade over GSpreadFinanceManager meant to be used from the aiogram handlers. Every Google Sheets
+    request runs in the bounded `BLOCKING_EXECUTOR` thread pool, while the waits for the shared rate limiter and
+    on quota exceed errors are done with `asyncio.sleep`, so an import backing off never stalls the event loop
+    nor holds a worker thread.
+
+    The wrapped manager is created with `blocking_backoff=False`: each step of an import (a read, a block of
+    rows) is a single request, paced and retried here as a whole when the quota is exceeded. The worksheets
+    are resolved in a step of their own, so that the later steps only hit the worksheet cache.
+
+    Use `await AsyncGSpreadFinanceManager.create()` to build the manager in the pool, since authenticating the
+    gspread client reads the service account file; `chat_id` selects the settings of a chat, `spreadsheet_id`
+    overrides their spreadsheet. The optional
+    `progress` (an ImportProgress) is told about the rows written and the waits for the quota.
+    """
+    def __init__(self, manager, progress=None):
+        self.manager = manager
+        self.progress = progress if progress is not None else ImportProgress()
+        self.max_retries = manager.max_retries
+        self.retry_delay = manager.retry_delay
+        self.rate_limiter = manager.rate_limiter
+
+    @classmethod
+    async def create(cls, progress=None, chat_id=None, spreadsheet_id=None):
+        manager = await run_blocking(GSpreadFinanceManager, blocking_backoff=False, chat_id=chat_id,
+                                     spreadsheet_id=spreadsheet_id)
+        return cls(manager, progress)
+
+    async def _request(self, kind, fn, *args, tokens=1, **kwargs):
+        """
+        Runs a step of the wrapped manager in the thread pool once the rate limiter allows `tokens` requests of
+        the given kind. If the quota is exceeded anyway, the step is retried up to `self.max_retries` times with
+        the limiter's jittered exponential backoff, awaited with `asyncio.sleep`. Cancelling the caller interrupts
+        the waits, but a step already running is completed first.
+
+        Raises:
+        - APIError: If an API error occurs that is not related to exceeding the quota limit.
+        - SheetsQuotaError: If the quota is still exceeded after `self.max_retries` retries.
+        """
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire_async(kind, tokens, on_wait=self.progress.waiting)
+            step = asyncio.ensure_future(run_blocking(fn, *args, **kwargs))
+            try:
+                return await asyncio.shield(step)
+            except asyncio.CancelledError:
+                # the request is already sent and its thread can't be stopped: let the step finish (e.g. recording
+                # the rows it wrote in the deduplication index) before the cancellation goes on
+                await asyncio.gather(step, return_exceptions=True)
+                raise
+            except APIError as error:
+                if error.response.status_code != 429:  # Check if the error is due to excessive requests (free google api support 60 req/min)
+                    raise  # Re-raise the error if it's not related to quota exceeding
+                if attempt == self.max_retries:
+                    raise SheetsQuotaError(
+                        f"Google Sheets {kind} quota still exceeded after {self.max_retries} retries") from error
+                delay = self.rate_limiter.backoff(kind, attempt, self.retry_delay)
+                print(f"Quota exceeded for {kind} requests, retrying in {delay:.1f} seconds...")
+                self.progress.waiting(delay)
+
+    async def _get_worksheet(self, sheet_name):
+        """Resolves a worksheet, paying a read request only when its handle isn't cached yet."""
+        manager = self.manager
+        worksheet = manager.worksheet_cache.get_worksheet(manager.account, manager.spreadsheet_id, sheet_name)
+        if worksheet is None:
+            worksheet = await self._request('read', manager._get_worksheet, sheet_name)
+        return worksheet
+
+    async def _ensure_dedup_indexes(self, sheet_names, bank):
+        """Builds the deduplication indexes of the worksheets that don't have one yet, with a single read."""
+        manager = self.manager
+        # loading an index and waiting for a rebuild in progress are blocking, like every other index operation
+        if await run_blocking(manager._missing_dedup_indexes, sheet_names, bank):
+            await self._request('read', manager._ensure_dedup_indexes, sheet_names, bank)
+
+    async def _read(self, ranges, fn, *args, value_render_option=None):
+        """Runs a step reading `ranges`, paying a read request only if some of them aren't in the read cache."""
+        if None in self.manager._cached_ranges(ranges, value_render_option):
+            return await self._request('read', fn, *args)
+        return await run_blocking(fn, *args)
+
+    async def _prefetch_resume_state(self, sheets, bank):
+        """Async counterpart of `GSpreadFinanceManager._prefetch_resume_state`."""
+        manager = self.manager
+        for sheet_name, _ in sheets:
+            await self._get_worksheet(sheet_name)
+        if bank in FINGERPRINT_COLUMNS:
+            await self._ensure_dedup_indexes([sheet_name for sheet_name, _ in sheets], bank)
+        else:
+            ranges = [(sheet_name, manager._latest_date_range(row_number)) for sheet_name, row_number in sheets]
+            await self._read(ranges, manager._latest_dates, sheets)
+
+    async def get_data(self, sheet_name, range_name):
+        """Retrieve data from a specified range in a worksheet."""
+        return (await self.get_ranges([(sheet_name, range_name)]))[0]
+
+    async def get_ranges(self, ranges, value_render_option=None):
+        """Async counterpart of `GSpreadFinanceManager.get_ranges`, with the same arguments."""
+        for sheet_name in {sheet_name for sheet_name, _ in ranges}:
+            await self._get_worksheet(sheet_name)
+        return await self._read(ranges, self.manager.get_ranges, ranges, value_render_option,
+                                value_render_option=value_render_option)
+
+    async def insert_row_with_data(self, sheet_name, values, row_number, direction='below', resume_mode=False,
+                                   ordered=False, bulk=True, bank=None) -> int:
+        """Async counterpart of `GSpreadFinanceManager.insert_row_with_data`, with the same arguments."""
+        manager = self.manager
+        await self._get_worksheet(sheet_name)
+        if resume_mode and bank in FINGERPRINT_COLUMNS:
+            await self._ensure_dedup_indexes([sheet_name], bank)
+            values = await run_blocking(manager._filter_unseen_values, sheet_name, values, bank,
+                                        manager._sort_ascending(ordered))
+        elif resume_mode:
+            values = await self._read([(sheet_name, manager._latest_date_range(row_number))],
+                                      manager._filter_new_values, sheet_name, values, row_number,
+                                      manager._sort_ascending(ordered))
+
+        insert_position = manager._insert_position(row_number, direction)
+        await self._write_rows(sheet_name, insert_position, values, bank, bulk)
+        if manager._needs_sort(len(values)):
+            await self._request('write', manager._sort_rows, sheet_name, insert_position, ascending=ordered)
+        return len(values)
+
+    async def _write_rows(self, sheet_name, insert_position, rows, bank=None, bulk=True):
+        """Writes rows starting from `insert_position`, one block (or one row, if not `bulk`) per step."""
+        manager = self.manager
+        self.progress.rows_planned(len(rows))
+        if bulk:
+            for position, chunk in manager._batches(insert_position, rows):
+                await self._request('write', manager._write_block, sheet_name, position, chunk, bank)
+                self.progress.rows_written(len(chunk))
+        else:
+            # gspread's insert_row makes room and writes the values with two separate requests
+            tokens = 1 if manager.write_mode == manager.APPEND else 2
+            for position, value in enumerate(rows, start=insert_position):
+                await self._request('write', manager._write_row, sheet_name, position, value, bank, tokens=tokens)
+                self.progress.rows_written(1)
+
+    async def insert_transactions(self, transactions, resume_mode=False, ordered=False, bulk=True) -> []:
+        """Async counterpart of `GSpreadFinanceManager.insert_transactions`, with the same arguments."""
+        bank = transactions[0].bank if transactions else None
+        partitions = await run_blocking(self.manager._partition_transactions, transactions)
+        return await self._insert_partitions(partitions, resume_mode, ordered, bulk, bank)
+
+    async def _insert_partitions(self, partitions, resume_mode, ordered, bulk, bank) -> []:
+        if resume_mode:
+            await self._prefetch_resume_state(
+                [sheet for sheet, rows in zip(self.manager._target_sheets(), partitions) if rows], bank)
+        added = []
+        for (sheet_name, start_row), rows in zip(self.manager._target_sheets(), partitions):
+            added.append(await self.insert_row_with_data(sheet_name, rows, start_row, direction='below',
+                                                         resume_mode=resume_mode, ordered=ordered, bulk=bulk,
+                                                         bank=bank) if rows else 0)
+        return added
@@ -0,0 +1,28 @@
+import asyncio
+import functools
+import importlib
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from config.config import CONFIG
+
+# bounded pool shared by every blocking call made on behalf of the bot handlers (gspread requests, file parsing)
+BLOCKING_EXECUTOR = ThreadPoolExecutor(max_workers=CONFIG['SPREADSHEET'].get('SHEETS_WORKERS', 4),
+                                       thread_name_prefix="sheets")
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Runs a blocking callable in the shared bounded thread pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(BLOCKING_EXECUTOR, functools.partial(fn, *args, **kwargs))
+
+
+async def import_blocking(name):
+    """
+    Returns the module `name`, importing it in the thread pool the first time. The modules depending on pandas,
+    openpyxl or gspread are loaded this way, on first use, so that they don't slow down the startup of the bot
+    and their import doesn't block the event loop.
+    """
+    module = sys.modules.get(name)
+    if module is None:
+        module = await run_blocking(importlib.import_module, name)
+    return module
@@ -0,0 +1,84 @@
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+import gspread
+from google.auth.transport.requests import AuthorizedSession, Request
+from google.oauth2.service_account import Credentials
+from config.config import CONFIG
+from sheets.worksheet_cache import WORKSHEET_CACHE
+
+
+class _ClientEntry:
+    def __init__(self, service_account_file):
+        self.modified_at = os.path.getmtime(service_account_file)
+        self.credentials = Credentials.from_service_account_file(service_account_file, scopes=gspread.auth.DEFAULT_SCOPES)
+        self.session = AuthorizedSession(self.credentials)
+        self.client = gspread.Client(self.credentials, session=self.session)
+        self.lock = threading.Lock()
+
+    def expires_within(self, margin):
+        expiry = self.credentials.expiry  # naive UTC, None until the first token is fetched
+        if expiry is None or not self.credentials.token:
+            return True
+        return expiry - datetime.now(timezone.utc).replace(tzinfo=None) < margin
+
+
+class ClientRegistry:
+    """
+    A process-wide registry of authorized gspread clients, one per service account file, shared by every
+    GSpreadFinanceManager. Building a client means parsing the key file, exchanging a token and opening a new
+    HTTP session, so the client is built once and its keep-alive session is reused by all the imports.
+
+    The access token is refreshed proactively by `get` when it expires within `refresh_margin` seconds, so an
+    import never starts with a token about to expire. Clients are keyed by the absolute path of the key file, so
+    a chat switching to another `SERVICE_ACCOUNT_FILE` simply gets the client of that file; a client is rebuilt
+    only when its key file changes on disk.
+    """
+    def __init__(self, refresh_margin=300):
+        self.refresh_margin = timedelta(seconds=refresh_margin)
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, service_account_file):
+        """
+        Returns the gspread client authorized with `service_account_file`, with a token valid for at least
+        `refresh_margin` seconds.
+
+        Raises:
+        - FileNotFoundError: If the service account file doesn't exist.
+        - google.auth.exceptions.RefreshError: If a token can't be obtained.
+        """
+        path = os.path.abspath(service_account_file)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry.modified_at != os.path.getmtime(path):
+                if entry is not None:
+                    self._discard(entry)
+                entry = self._entries[path] = _ClientEntry(path)
+        with entry.lock:
+            if entry.expires_within(self.refresh_margin):
+                # a plain transport: refreshing through the AuthorizedSession itself would make it try to
+                # authorize the token request with the very credentials being refreshed
+                entry.credentials.refresh(Request())
+        return entry.client
+
+    def invalidate(self, service_account_file=None):
+        """Drops the client of a service account file (or all of them), so that it's rebuilt on next use."""
+        with self._lock:
+            if service_account_file is None:
+                paths = list(self._entries)
+            else:
+                paths = [os.path.abspath(service_account_file)]
+            for path in paths:
+                entry = self._entries.pop(path, None)
+                if entry is not None:
+                    self._discard(entry)
+
+    @staticmethod
+    def _discard(entry):
+        # the cached worksheets are bound to the session of the old client
+        WORKSHEET_CACHE.invalidate()
+        entry.session.close()
+
+
+CLIENT_REGISTRY = ClientRegistry(refresh_margin=CONFIG['SPREADSHEET'].get('TOKEN_REFRESH_MARGIN', 300))
@@ -0,0 +1,161 @@
+import hashlib
+import threading
+import time
+from collections import Counter
+from config.config import CONFIG
+from config.database import add_column, connect
+
+# positions of (date, amount, description, balance) in the serialized rows of each bank, None if missing
+FINGERPRINT_COLUMNS = {
+    'revolut': (0, 5, 4, 9),
+    'unicredit': (0, 2, 1, None),
+}
+
+
+def _normalize(value):
+    """Renders a cell the same way whether it comes from a parsed statement or from the spreadsheet."""
+    if value is None:
+        return ""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f"{float(value):.2f}"
+    value = str(value).strip()
+    try:
+        return f"{float(value):.2f}"
+    except ValueError:
+        return value
+
+
+def fingerprint(row, bank):
+    """
+    Returns the fingerprint of a serialized transaction row: a hash of its date, amount, description, balance
+    and bank. Rows shorter than expected (e.g. blank rows of the spreadsheet) are fingerprinted with empty cells.
+    """
+    parts = [bank]
+    for position in FINGERPRINT_COLUMNS[bank]:
+        parts.append(_normalize(row[position]) if position is not None and position < len(row) else "")
+    return hashlib.blake2b("\x1f".join(parts).encode(), digest_size=16).hexdigest()
+
+
+class DedupIndex:
+    """
+    A persistent index of the transactions already written to each worksheet, used to import exactly the rows
+    that are missing whatever the order or the overlap of the uploaded statements.
+
+    The index maps the fingerprint of a row to the number of rows with that fingerprint in the worksheet, so
+    identical transactions (e.g. two equal payments on the same day) are counted rather than collapsed. Each
+    worksheet has its own scope per bank, identified by spreadsheet ID, worksheet name and bank, since rows are
+    fingerprinted with the layout of their bank. Scopes are loaded in memory on first use, making lookups O(1),
+    and stored in a SQLite database at `path`.
+
+    The index only sees the rows written by the bot: a scope older than `max_age` seconds (0 for never) is
+    considered stale and rebuilt from the worksheet on next use, so that rows deleted or edited by hand are
+    eventually taken into account. `invalidate` forces the rebuild right away.
+    """
+    def __init__(self, path, max_age=0):
+        self.path = path
+        self.max_age = max_age
+        self._scopes = {}
+        self._built_at = {}
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = connect(
+                self.path,
+                "CREATE TABLE IF NOT EXISTS fingerprints ("
+                "scope TEXT NOT NULL, fingerprint TEXT NOT NULL, count INTEGER NOT NULL, "
+                "PRIMARY KEY (scope, fingerprint))",
+                "CREATE TABLE IF NOT EXISTS scopes (scope TEXT PRIMARY KEY, built_at REAL NOT NULL DEFAULT 0)",
+            )
+            # scopes built before they expired are stale, and rebuilt on next use
+            add_column(self._connection, 'scopes', 'built_at', "REAL NOT NULL DEFAULT 0")
+        return self._connection
+
+    def _load(self, scope):
+        counts = self._scopes.get(scope)
+        if counts is None:
+            connection = self._connect()
+            row = connection.execute("SELECT built_at FROM scopes WHERE scope = ?", (scope,)).fetchone()
+            if row is None:
+                return None
+            rows = connection.execute("SELECT fingerprint, count FROM fingerprints WHERE scope = ?", (scope,))
+            counts = self._scopes[scope] = Counter(dict(rows))
+            self._built_at[scope] = row[0]
+        if self.max_age and time.time() - self._built_at[scope] > self.max_age:
+            return None
+        return counts
+
+    def has_scope(self, scope):
+        """Tells whether the index of a worksheet has been built and isn't stale."""
+        with self._lock:
+            return self._load(scope) is not None
+
+    def rebuild(self, scope, rows, bank):
+        """Replaces the index of a worksheet with the fingerprints of `rows`, the whole content of the worksheet."""
+        counts = Counter(fingerprint(row, bank) for row in rows if any(cell not in (None, "") for cell in row))
+        built_at = time.time()
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("DELETE FROM fingerprints WHERE scope = ?", (scope,))
+                connection.executemany("INSERT INTO fingerprints (scope, fingerprint, count) VALUES (?, ?, ?)",
+                                       [(scope, key, count) for key, count in counts.items()])
+                connection.execute("INSERT OR REPLACE INTO scopes (scope, built_at) VALUES (?, ?)", (scope, built_at))
+            self._scopes[scope] = counts
+            self._built_at[scope] = built_at
+
+    def missing(self, scope, rows, bank, seen=None):
+        """
+        Returns the rows that aren't in the worksheet yet, keeping their order. A row whose fingerprint appears
+        k times in `rows` and n times in the worksheet is returned max(k - n, 0) times.
+
+        When a statement is checked in several chunks, the same `seen` Counter must be passed for all of them and
+        each chunk must be recorded with `add` once written, so that repeated transactions are counted across chunks.
+        """
+        with self._lock:
+            counts = self._load(scope) or Counter()
+            seen = seen if seen is not None else Counter()
+            result = []
+            for row in rows:
+                key = fingerprint(row, bank)
+                seen[key] += 1
+                if seen[key] > counts[key]:
+                    result.append(row)
+            return result
+
+    def add(self, scope, rows, bank):
+        """Records rows that have just been written to the worksheet."""
+        added = Counter(fingerprint(row, bank) for row in rows)
+        with self._lock:
+            counts = self._load(scope)
+            if counts is None:
+                return  # not built yet: the next rebuild reads the rows from the worksheet anyway
+            counts.update(added)
+            connection = self._connect()
+            with connection:
+                connection.executemany(
+                    "INSERT INTO fingerprints (scope, fingerprint, count) VALUES (?, ?, ?) "
+                    "ON CONFLICT (scope, fingerprint) DO UPDATE SET count = count + excluded.count",
+                    [(scope, key, count) for key, count in added.items()])
+
+    def invalidate(self, prefix=""):
+        """
+        Forgets the indexes of the scopes starting with `prefix` (all of them by default), so that they're rebuilt
+        from the sheet on next use: e.g. "<spreadsheet ID>/" for a whole spreadsheet, "<spreadsheet ID>/<worksheet
+        name>/" for the scopes of a worksheet. Returns the number of scopes forgotten.
+        """
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("DELETE FROM fingerprints WHERE substr(scope, 1, ?) = ?", (len(prefix), prefix))
+                forgotten = connection.execute("DELETE FROM scopes WHERE substr(scope, 1, ?) = ?",
+                                               (len(prefix), prefix)).rowcount
+            for scope in [scope for scope in self._scopes if scope.startswith(prefix)]:
+                del self._scopes[scope]
+                del self._built_at[scope]
+            return forgotten
+
+
+DEDUP_INDEX = DedupIndex(CONFIG['SETTINGS'].get('DEDUP_INDEX_PATH', 'data/dedup_index.sqlite3'),
+                         max_age=CONFIG['SETTINGS'].get('DEDUP_INDEX_MAX_AGE', 86400))
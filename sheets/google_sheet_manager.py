@@ -1,8 +1,17 @@
 from datetime import datetime
-import gspread
+from operator import itemgetter
+import numbers
+import os
 import time
-from gspread.exceptions import APIError
-from config.config import CONFIG
+from gspread.exceptions import APIError, WorksheetNotFound
+from config.profiles import PROFILE_STORE
+from models.transaction import Transaction
+from monitoring.metrics import METRICS
+from sheets.client_registry import CLIENT_REGISTRY
+from sheets.dedup_index import DEDUP_INDEX, FINGERPRINT_COLUMNS
+from sheets.rate_limiter import RATE_LIMITER, SheetsQuotaError
+from sheets.read_cache import READ_CACHE
+from sheets.worksheet_cache import WORKSHEET_CACHE
 
 
 class GSpreadFinanceManager:
@@ -10,26 +19,112 @@ class GSpreadFinanceManager:
     A class for managing interactions with Google Sheets using the gspread library. It provides functionality
     to insert, retrieve, and manipulate data within specified worksheets of a Google Spreadsheet. The class
     supports handling different types of financial transactions (incomes and expenses) and implements retry
-    logic for operations that may exceed Google API's rate limits.
+    logic for operations that may exceed Google API's rate limits. Every request is paced by the process-wide
+    `RATE_LIMITER`, shared by all the instances, so concurrent imports split the quota instead of exceeding it.
+    Values read are kept for a few seconds in the shared `READ_CACHE`, invalidated by the writes made here.
+
+    The settings are those of the chat `chat_id` (see `PROFILE_STORE`), or the global ones if it's None;
+    `spreadsheet_id` overrides the spreadsheet of the settings, e.g. to sync rows meant for a previous one.
+
+    With the 'insert' `WRITE_MODE` (default) new rows are inserted at the start row of the worksheet, shifting
+    the existing ones down. With the 'append' mode they are appended after the last row in chronological order,
+    so the cost of an import doesn't grow with the size of the worksheet; when `SORT_AFTER_APPEND` is enabled the
+    worksheet is then sorted by date by the server, like the insert mode would have laid it out.
     """
-    def __init__(self):
-        self.spreadsheet_id = CONFIG['SPREADSHEET']['SPREADSHEET_ID']
-        self.client = self._init_client(CONFIG['SPREADSHEET']['SERVICE_ACCOUNT_FILE'])
-        self.worksheet_income_name = CONFIG['SPREADSHEET']['WORKSHEET_INCOME_NAME']
-        self.worksheet_expenses_name = CONFIG['SPREADSHEET']['WORKSHEET_EXPENSES_NAME']
-        self.income_start_row = CONFIG['SPREADSHEET']['INCOME_START_ROW']
-        self.expenses_start_row = CONFIG['SPREADSHEET']['EXPENSES_START_ROW']
-        self.split_income_expenses = CONFIG['SPREADSHEET']['SPLIT_INCOME_EXPENSES']
-        self.retry_delay = CONFIG['SPREADSHEET']['RETRY_DELAY']
-        self.max_retries = CONFIG['SPREADSHEET']['MAX_RETRIES']
+    INSERT = 'insert'
+    APPEND = 'append'
+
+    def __init__(self, blocking_backoff=True, chat_id=None, spreadsheet_id=None):
+        config = PROFILE_STORE.settings(chat_id)
+        self.spreadsheet_id = spreadsheet_id or config['SPREADSHEET']['SPREADSHEET_ID']
+        # the service account the cached handles and values are bound to, see WorksheetCache and ReadCache
+        self.account = os.path.abspath(config['SPREADSHEET']['SERVICE_ACCOUNT_FILE'])
+        self.client = self._init_client(config['SPREADSHEET']['SERVICE_ACCOUNT_FILE'])
+        self.worksheet_income_name = config['SPREADSHEET']['WORKSHEET_INCOME_NAME']
+        self.worksheet_expenses_name = config['SPREADSHEET']['WORKSHEET_EXPENSES_NAME']
+        self.income_start_row = config['SPREADSHEET']['INCOME_START_ROW']
+        self.expenses_start_row = config['SPREADSHEET']['EXPENSES_START_ROW']
+        self.worksheet_transactions_name = config['SPREADSHEET'].get('WORKSHEET_TRANSACTIONS_NAME', 'Transactions')
+        self.transactions_start_row = config['SPREADSHEET'].get('TRANSACTIONS_START_ROW', 2)
+        self.split_income_expenses = config['SPREADSHEET']['SPLIT_INCOME_EXPENSES']
+        self.retry_delay = config['SPREADSHEET']['RETRY_DELAY']
+        self.max_retries = config['SPREADSHEET']['MAX_RETRIES']
+        self.batch_size = config['SPREADSHEET'].get('BATCH_SIZE', 500)
+        self.write_mode = config['SPREADSHEET'].get('WRITE_MODE', self.INSERT)
+        self.sort_after_append = config['SPREADSHEET'].get('SORT_AFTER_APPEND', False)
+        self.worksheet_cache = WORKSHEET_CACHE
+        self.read_cache = READ_CACHE
+        self.rate_limiter = RATE_LIMITER
+        self.dedup_index = DEDUP_INDEX
+        self.blocking_backoff = blocking_backoff
 
     def _init_client(self, service_account_file):
-        """Initialize the gspread client with a service account."""
-        return gspread.service_account(filename=service_account_file)
+        """Returns the shared gspread client of a service account, authorized once per process."""
+        return CLIENT_REGISTRY.get(service_account_file)
+
+    def _request(self, kind, fn, *args, **kwargs):
+        """
+        Runs a single Google Sheets API call once the rate limiter allows it. If the quota is exceeded anyway, the
+        call is retried up to `self.max_retries` times with a jittered exponential backoff capped at
+        `self.retry_delay` seconds.
+
+        When `self.blocking_backoff` is False neither pacing nor retries are done here and the quota error is
+        raised straight away: the caller is in charge of both, which is how AsyncGSpreadFinanceManager keeps the
+        waits off the worker threads.
+
+        Args:
+        - kind (str): 'read' or 'write', the quota the request is counted against.
+        - fn (callable): The gspread method performing the request, called with the remaining arguments.
+
+        Raises:
+        - APIError: If an API error occurs that is not related to exceeding the quota limit, or any quota error
+          when `self.blocking_backoff` is False.
+        - SheetsQuotaError: If the quota is still exceeded after `self.max_retries` retries.
+        """
+        if not self.blocking_backoff:
+            return self._call(kind, fn, *args, **kwargs)
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire(kind)
+            try:
+                return self._call(kind, fn, *args, **kwargs)
+            except APIError as error:
+                if error.response.status_code != 429:  # Check if the error is due to excessive requests (free google api support 60 req/min)
+                    raise  # Re-raise the error if it's not related to quota exceeding
+                if attempt == self.max_retries:
+                    raise SheetsQuotaError(
+                        f"Google Sheets {kind} quota still exceeded after {self.max_retries} retries") from error
+                delay = self.rate_limiter.backoff(kind, attempt, self.retry_delay)
+                print(f"Quota exceeded for {kind} requests, retrying in {delay:.1f} seconds...")
+
+    @staticmethod
+    def _call(kind, fn, *args, **kwargs):
+        """
+        Makes a single API call, recording it in the metrics by method (the name of `fn`, e.g. 'batch_update'
+        or 'values_batch_get'): the calls made, their duration and the errors answered by status code.
+        """
+        method = getattr(fn, '__name__', 'request')
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except APIError as error:
+            METRICS.inc('sheets_api_errors_total', method=method, status=error.response.status_code)
+            raise
+        finally:
+            METRICS.inc('sheets_api_calls_total', kind=kind, method=method)
+            METRICS.observe('sheets_api_seconds', time.perf_counter() - start, method=method)
+
+    def _open_spreadsheet(self):
+        """Returns the configured Spreadsheet, opening it only if no cached handle is available."""
+        spreadsheet = self.worksheet_cache.get_spreadsheet(self.account, self.spreadsheet_id)
+        if spreadsheet is None:
+            spreadsheet = self.client.open_by_key(self.spreadsheet_id)
+            self.worksheet_cache.put_spreadsheet(self.account, self.spreadsheet_id, spreadsheet)
+        return spreadsheet
 
     def _get_worksheet(self, sheet_name):
         """
         Attempts to retrieve a specific worksheet by its name from a Google Spreadsheet.
+        Handles are served from the shared worksheet cache, so only the first lookup of a worksheet hits the API.
         This function will retry the operation up to a specified number of attempts (`self.max_retries`)
         if it encounters a quota exceed error from the Google Sheets API.
 
@@ -44,21 +139,26 @@ class GSpreadFinanceManager:
         - gspread.exceptions.WorksheetNotFound: If no worksheet with the specified name exists.
 
         Notes:
-        - The function uses exponential backoff in case of quota exceed errors, waiting for `self.retry_delay` seconds before retrying.
+        - The function uses a jittered exponential backoff in case of quota exceed errors, capped at `self.retry_delay` seconds.
         - The Google Sheets API has a limit of 60 requests per minute for free accounts, which is why quota exceed errors may occur.
         - This function is part of a class that interacts with the Google Sheets API, where `self.client` is an authenticated gspread client,
           `self.spreadsheet_id` is the ID of the spreadsheet, `self.max_retries` is the maximum number of retries for API requests,
-          and `self.retry_delay` is the delay between retries.
+          and `self.retry_delay` is the maximum delay between retries.
         """
-        for attempt in range(self.max_retries):
-            try:
-                return self.client.open_by_key(self.spreadsheet_id).worksheet(sheet_name)
-            except APIError as error:
-                if error.response.status_code == 429:  # Check if the error is due to excessive requests (free google api support 60 req/min)
-                    print(f"Quota exceeded for read requests, retrying in {self.retry_delay} seconds...")
-                    time.sleep(self.retry_delay)
-                else:
-                    raise  # error isn't for excessive requests
+        worksheet = self.worksheet_cache.get_worksheet(self.account, self.spreadsheet_id, sheet_name)
+        if worksheet is not None:
+            return worksheet
+        return self._request('read', self._open_worksheet, sheet_name)
+
+    def _open_worksheet(self, sheet_name):
+        try:
+            worksheet = self._open_spreadsheet().worksheet(sheet_name)
+        except WorksheetNotFound:
+            # the worksheet was renamed or deleted: drop every handle of this spreadsheet
+            self.worksheet_cache.invalidate(self.spreadsheet_id)
+            raise
+        self.worksheet_cache.put_worksheet(self.account, self.spreadsheet_id, sheet_name, worksheet)
+        return worksheet
 
     def _prepare_values(self, values, skip_first_value=True, ordered=False):
         """
@@ -78,7 +178,8 @@ class GSpreadFinanceManager:
           include the first row, depending on the function arguments.
 
         Notes:
-        - The datetime string in the first column of each row is expected to follow the "%Y-%m-%dT%H:%M:%S" format.
+        - The datetime string in the first column of each row is expected to be in ISO format ("%Y-%m-%dT%H:%M:%S"),
+          and is parsed once per row with `datetime.fromisoformat`.
         - If the sorting fails due to a mismatch in the expected datetime format, an error message will be printed,
           and the original (or sliced) list will be returned without sorting.
         """
@@ -86,8 +187,8 @@ class GSpreadFinanceManager:
             values = values[1:]  # Skipping the header row
         if not ordered:
             try:
-                values.sort(key=lambda x: datetime.strptime(x[0], "%Y-%m-%dT%H:%M:%S"), reverse=True)
-            except ValueError as e:
+                values.sort(key=lambda x: datetime.fromisoformat(x[0]), reverse=True)
+            except (TypeError, ValueError) as e:
                 print(f"Error sorting values: {e}")
         return values
 
@@ -111,19 +212,163 @@ class GSpreadFinanceManager:
         if values is None:
             values = []
         worksheet = self._get_worksheet(sheet_name)
-        for attempt in range(self.max_retries):
-            try:
-                worksheet.insert_row(values or [''] * worksheet.col_count, index=row_index)
-                break
-            except APIError as error:
-                if error.response.status_code == 429:  # Check if the error is due to excessive requests (free google api support 60 req/min)
-                    print(f"Quota exceeded, retrying in {self.retry_delay} seconds...")
-                    time.sleep(self.retry_delay)
+        self._write(sheet_name, worksheet.insert_row, values or [''] * worksheet.col_count, index=row_index)
+
+    @staticmethod
+    def _to_cell(value):
+        """Converts a python value into a Sheets API CellData, keeping numbers numeric like a RAW insert does."""
+        if value is None or (isinstance(value, float) and value != value):  # None and NaN become empty cells
+            return {}
+        if isinstance(value, bool):
+            return {"userEnteredValue": {"boolValue": value}}
+        if isinstance(value, numbers.Number):
+            return {"userEnteredValue": {"numberValue": float(value)}}
+        return {"userEnteredValue": {"stringValue": str(value)}}
+
+    def _insert_rows(self, sheet_name, row_index, rows):
+        """
+        Inserts a block of rows at a given position with a single API request. Room for the rows is made with an
+        `insertDimension` request and the values are written with an `updateCells` request, both sent in the same
+        `batchUpdate` call, so the block is either inserted entirely or not at all.
 
-                else:
-                    raise  # Re-raise the error if it's not related to quota exceeding
+        Args:
+        - sheet_name (str): The name of the worksheet where the rows will be inserted.
+        - row_index (int): The 1-based index where the first row of the block will be inserted.
+        - rows (list of lists): The rows to insert, in the order they should appear in the worksheet.
+
+        Raises:
+        - ValueError: If `row_index` is None.
+        - APIError: If any unexpected API error occurs that is not related to exceeding the quota.
+        """
+        if row_index is None:
+            raise ValueError("row index cannot be null!")
+        if not rows:
+            return
+        worksheet = self._get_worksheet(sheet_name)
+        start_index = row_index - 1
+        body = {
+            "requests": [
+                {
+                    "insertDimension": {
+                        "range": {
+                            "sheetId": worksheet.id,
+                            "dimension": "ROWS",
+                            "startIndex": start_index,
+                            "endIndex": start_index + len(rows),
+                        },
+                        "inheritFromBefore": False,
+                    }
+                },
+                {
+                    "updateCells": {
+                        "rows": [{"values": [self._to_cell(value) for value in row]} for row in rows],
+                        "fields": "userEnteredValue",
+                        "start": {"sheetId": worksheet.id, "rowIndex": start_index, "columnIndex": 0},
+                    }
+                },
+            ]
+        }
+        self._batch_update(sheet_name, worksheet, body)
+
+    def _append_rows(self, sheet_name, rows):
+        """
+        Appends a block of rows after the last row holding data with a single `appendCells` request: unlike
+        `_insert_rows`, no existing row is moved, so the cost doesn't depend on the size of the worksheet.
 
-    def _filter_and_sort_values(self, values, latest_date=None, sort_ascending=True):
+        Raises:
+        - APIError: If any unexpected API error occurs that is not related to exceeding the quota.
+        """
+        if not rows:
+            return
+        worksheet = self._get_worksheet(sheet_name)
+        body = {
+            "requests": [
+                {
+                    "appendCells": {
+                        "sheetId": worksheet.id,
+                        "rows": [{"values": [self._to_cell(value) for value in row]} for row in rows],
+                        "fields": "userEnteredValue",
+                    }
+                },
+            ]
+        }
+        self._batch_update(sheet_name, worksheet, body)
+
+    def _sort_rows(self, sheet_name, row_index, ascending=False):
+        """Sorts the rows of a worksheet from `row_index` (1-based) to the end by date, with one server-side request."""
+        worksheet = self._get_worksheet(sheet_name)
+        body = {
+            "requests": [
+                {
+                    "sortRange": {
+                        "range": {"sheetId": worksheet.id, "startRowIndex": row_index - 1},
+                        "sortSpecs": [{"dimensionIndex": 0, "sortOrder": "ASCENDING" if ascending else "DESCENDING"}],
+                    }
+                },
+            ]
+        }
+        self._batch_update(sheet_name, worksheet, body)
+
+    def _write(self, sheet_name, fn, *args, **kwargs):
+        """Makes a write request to a worksheet, dropping the values of the worksheet from the read cache."""
+        try:
+            return self._request('write', fn, *args, **kwargs)
+        finally:
+            self.read_cache.invalidate(self.spreadsheet_id, sheet_name)
+
+    def _batch_update(self, sheet_name, worksheet, body):
+        try:
+            self._write(sheet_name, worksheet.spreadsheet.batch_update, body)
+        except APIError as error:
+            if error.response.status_code != 429:
+                # the cached handle may point to a deleted or recreated worksheet
+                self.worksheet_cache.invalidate(self.spreadsheet_id, sheet_name)
+            raise
+
+    def _write_block(self, sheet_name, row_index, rows, bank=None):
+        """
+        Writes a block of rows with a single request, inserted at `row_index` or appended according to the mode,
+        and records them in the deduplication index when their `bank` is known. Writing and recording are one
+        step, so that a block is never in the worksheet without being in the index.
+        """
+        if self.write_mode == self.APPEND:
+            self._append_rows(sheet_name, rows)
+        else:
+            self._insert_rows(sheet_name, row_index, rows)
+        self._record_inserted(sheet_name, rows, bank)
+
+    def _write_row(self, sheet_name, row_index, value, bank=None):
+        """Per-row counterpart of `_write_block`."""
+        if self.write_mode == self.APPEND:
+            self._append_rows(sheet_name, [value])
+        else:
+            self._add_row(sheet_name, row_index, value)
+        self._record_inserted(sheet_name, [value], bank)
+
+    def _sort_ascending(self, ordered):
+        """Tells how the rows must be sorted before being written: appended rows are always chronological."""
+        return ordered or self.write_mode == self.APPEND
+
+    def _needs_sort(self, written):
+        """Tells whether the worksheet must be sorted after `written` rows have been appended to it."""
+        return written > 0 and self.write_mode == self.APPEND and self.sort_after_append
+
+    def _insert_rows_in_batches(self, sheet_name, row_index, rows, bank=None):
+        """
+        Inserts rows starting from `row_index` (or appends them, in append mode), splitting them into blocks of
+        `self.batch_size` rows so that very large imports don't exceed the request size limits. Each block costs a
+        single write request, and is recorded in the deduplication index once written when the `bank` of the rows
+        is known.
+        """
+        for insert_position, chunk in self._batches(row_index, rows):
+            self._write_block(sheet_name, insert_position, chunk, bank)
+
+    def _batches(self, row_index, rows):
+        """Yields (insert position, block of rows) pairs splitting `rows` into blocks of `self.batch_size` rows."""
+        for start in range(0, len(rows), self.batch_size):
+            yield row_index + start, rows[start:start + self.batch_size]
+
+    def _filter_and_sort_values(self, values, latest_date=None, sort_ascending=True, skip_header=True):
         """
         Filters and sorts a list of values based on the date contained in the first element of each value sublist.
         The function allows for excluding values older than a specified 'latest_date' and can sort the values
@@ -138,6 +383,8 @@ class GSpreadFinanceManager:
         - sort_ascending (bool, optional): Determines the order in which the filtered values are sorted based on the date.
           If True, the list is sorted in ascending order (earliest to latest). If False, it is sorted in descending order
           (latest to earliest). Defaults to True.
+        - skip_header (bool, optional): If True, the first row of 'values' is a header row and is skipped.
+          Defaults to True.
 
         Returns:
         - list of lists: The filtered and sorted list of values.
@@ -146,26 +393,26 @@ class GSpreadFinanceManager:
         - ValueError: If there's an error parsing the date string from the first value of any row.
 
         Notes:
-        - The function skips the first row in the 'values' list, assuming it to be a header row.
-        - Sorting is done based on the date parsed from the first element of each sublist in 'values'.
+        - Unless 'skip_header' is False, the function skips the first row in the 'values' list, assuming it to be a header row.
+        - The date of each row is parsed once with `datetime.fromisoformat` and carried alongside the row while
+          filtering and sorting (decorate-sort-undecorate), so the cost is one parse per row.
         - The function prints an error message if it encounters a ValueError, which typically indicates
           a mismatch between the expected date format and the actual format of the date string.
         """
-        filtered_values = []
-        for v in values[1:]:  # Skipping the header row
+        decorated = []  # (date, row) pairs, so that each date is parsed only once
+        for v in (values[1:] if skip_header else values):  # Skipping the header row
             try:
-                date = datetime.strptime(v[0], "%Y-%m-%dT%H:%M:%S")
-                if latest_date is None or date > latest_date:
-                    filtered_values.append(v)
-            except ValueError as e:
+                date = datetime.fromisoformat(v[0])
+            except (TypeError, ValueError) as e:
                 print(f"Error filtering values: {e}")
-        if sort_ascending:
-            filtered_values.sort(key=lambda x: datetime.strptime(x[0], "%Y-%m-%dT%H:%M:%S"))
-        else:
-            filtered_values.sort(key=lambda x: datetime.strptime(x[0], "%Y-%m-%dT%H:%M:%S"), reverse=True)
-        return filtered_values
-
-    def _insert_filtered_data(self, sheet_name, values, row_number, direction='below', include_type=None):
+                continue
+            if latest_date is None or date > latest_date:
+                decorated.append((date, v))
+        decorated.sort(key=itemgetter(0), reverse=not sort_ascending)
+        return [v for _, v in decorated]
+
+    def _insert_filtered_data(self, sheet_name, values, row_number, direction='below', include_type=None, bulk=True,
+                              bank=None):
         """
         Inserts a list of filtered data rows into a specified worksheet, starting from a given row number.
         Rows can be inserted below or above the specified row number. Optionally, only rows of a specific type
@@ -182,28 +429,131 @@ class GSpreadFinanceManager:
           insertion starts one row above the specified row number. Defaults to 'below'.
         - include_type (str, optional): If provided, only rows that have this value as their third element
           will be included in the insertion. If None, all rows are included. Defaults to None.
+        - bulk (bool, optional): If True (default), the rows are inserted in blocks of `self.batch_size` rows,
+          one write request per block. If False, the legacy path inserting one row per request is used.
+        - bank (str, optional): The bank the rows come from ('revolut' or 'unicredit'). When given, the inserted
+          rows are recorded in the deduplication index. Defaults to None.
 
         Behavior:
-        - The function iterates through the 'values' list, inserting each row into the worksheet at the
-          'insert_position', which is determined based on the 'direction' and 'row_number' parameters.
+        - The function inserts the 'values' rows into the worksheet starting at the 'insert_position', which is
+          determined based on the 'direction' and 'row_number' parameters, preserving their order.
         - If 'include_type' is specified, only rows matching this type will be inserted.
-        - The insertion position is updated after each insertion to ensure that rows are inserted sequentially.
 
         Note:
-        - This function relies on '_get_worksheet' to retrieve the worksheet object and '_add_row' to handle
-          the actual insertion of rows into the worksheet. Both of these helper functions need to be defined
-          within the same class.
+        - This function relies on '_insert_rows_in_batches' (bulk mode) or '_write_row' (per-row mode) to handle
+          the actual insertion of rows into the worksheet, which are appended instead in append mode.
         - It assumes that the worksheet exists and that the caller has the necessary permissions to modify it.
         """
-        worksheet = self._get_worksheet(sheet_name)
-        insert_position = row_number if direction == 'below' else max(row_number - 1, 1)
-        for value in values:
-            if include_type is None or value[2] == include_type:
-                self._add_row(sheet_name, insert_position, value)
-                insert_position += 1
+        insert_position = self._insert_position(row_number, direction)
+        rows = [value for value in values if include_type is None or value[2] == include_type]
+        if bulk:
+            self._insert_rows_in_batches(sheet_name, insert_position, rows, bank)
+            return
+        for value in rows:
+            self._write_row(sheet_name, insert_position, value, bank)
+            insert_position += 1
+
+    @staticmethod
+    def _insert_position(row_number, direction):
+        """Returns the 1-based row where an insertion relative to `row_number` in the given direction starts."""
+        return row_number if direction == 'below' else max(row_number - 1, 1)
+
+    def _latest_date_range(self, row_number):
+        """
+        Returns the range holding the latest date of a worksheet whose data starts at `row_number`: that row, or
+        the whole date column for appended worksheets that aren't sorted afterwards, whose latest date can be
+        anywhere.
+        """
+        if self.write_mode == self.APPEND and not self.sort_after_append:
+            return f"A{row_number}:A"
+        return f"{row_number}:{row_number}"
+
+    def _latest_dates(self, sheets):
+        """
+        Returns the latest date of several worksheets, given as (worksheet name, start row) pairs, reading them
+        with a single request. Cells that aren't ISO dates (notes, totals, dates typed by hand in another format)
+        are skipped, like `_filter_and_sort_values` does.
+        """
+        ranges = [(sheet_name, self._latest_date_range(row_number)) for sheet_name, row_number in sheets]
+        latest_dates = []
+        for rows in self.get_ranges(ranges):
+            cells = [row[0] for row in rows if row and row[0]]
+            if self.write_mode != self.APPEND or self.sort_after_append:
+                cells = cells[:1]
+            dates = []
+            for cell in cells:
+                try:
+                    dates.append(datetime.fromisoformat(cell))
+                except (TypeError, ValueError) as e:
+                    print(f"Error reading the latest date: {e}")
+            latest_dates.append(max(dates, default=datetime.min))
+        return latest_dates
+
+    def _latest_date(self, sheet_name, row_number):
+        """Reads the row at `row_number` and returns its date, the latest one in the worksheet."""
+        return self._latest_dates([(sheet_name, row_number)])[0]
+
+    def _filter_new_values(self, sheet_name, values, row_number, ordered=False):
+        """
+        Reads the row at `row_number` to find the latest date already in the worksheet and returns the entries of
+        `values` newer than it, sorted according to `ordered`. Used by the resume mode of `insert_row_with_data`.
+        """
+        latest_date = self._latest_date(sheet_name, row_number)
+        return self._filter_and_sort_values(values, latest_date=latest_date, sort_ascending=ordered,
+                                            skip_header=False)
+
+    def _dedup_scope(self, sheet_name, bank):
+        """
+        The scope of a worksheet in the deduplication index. Rows are fingerprinted according to the layout of
+        their bank, so a worksheet holding the statements of several banks has one scope per bank, each built
+        by reading the whole worksheet with that bank's layout.
+        """
+        return f"{self.spreadsheet_id}/{sheet_name}/{bank}"
+
+    def _missing_dedup_indexes(self, sheet_names, bank):
+        """
+        Returns the worksheets whose deduplication index isn't built (or is stale). Loads the indexes that are
+        built from SQLite, so it must run off the event loop.
+        """
+        return [sheet_name for sheet_name in sheet_names
+                if not self.dedup_index.has_scope(self._dedup_scope(sheet_name, bank))]
+
+    def _ensure_dedup_indexes(self, sheet_names, bank):
+        """Builds the deduplication indexes of the worksheets that don't have one yet, reading them all at once."""
+        missing = self._missing_dedup_indexes(sheet_names, bank)
+        if missing:
+            ranges = [(sheet_name, None) for sheet_name in missing]
+            for sheet_name, rows in zip(missing, self.get_ranges(ranges, 'UNFORMATTED_VALUE', cache=False)):
+                self.dedup_index.rebuild(self._dedup_scope(sheet_name, bank), rows, bank)
+
+    def _prefetch_resume_state(self, sheets, bank):
+        """
+        Reads with a single request what the resume mode needs for several worksheets, given as (worksheet name,
+        start row) pairs: their deduplication indexes are built if missing, or else their latest dates are read
+        into the read cache, where the `insert_row_with_data` calls that follow find them.
+        """
+        if bank in FINGERPRINT_COLUMNS:
+            self._ensure_dedup_indexes([sheet_name for sheet_name, _ in sheets], bank)
+        else:
+            self._latest_dates(sheets)
+
+    def _filter_unseen_values(self, sheet_name, values, bank, ordered=False):
+        """
+        Returns the entries of `values` that aren't in the worksheet yet according to the deduplication index,
+        sorted according to `ordered`. The index of the worksheet is built from the sheet if it doesn't exist yet,
+        which is the only case in which a read request is made. Used by the resume mode of `insert_row_with_data`.
+        """
+        self._ensure_dedup_indexes([sheet_name], bank)
+        values = self.dedup_index.missing(self._dedup_scope(sheet_name, bank), values, bank)
+        return self._filter_and_sort_values(values, sort_ascending=ordered, skip_header=False)
+
+    def _record_inserted(self, sheet_name, rows, bank):
+        """Adds rows just written to the worksheet to its deduplication index, if the bank of the rows is known."""
+        if bank in FINGERPRINT_COLUMNS:
+            self.dedup_index.add(self._dedup_scope(sheet_name, bank), rows, bank)
 
     def insert_row_with_data(self, sheet_name, values, row_number, direction='below', resume_mode=False,
-                             ordered=False) -> int:
+                             ordered=False, bulk=True, bank=None) -> int:
         """
         Inserts rows into a specified worksheet at a given position, with options for filtering based on date,
         sorting, and insertion direction. This method is designed to handle more complex insertion scenarios,
@@ -216,34 +566,93 @@ class GSpreadFinanceManager:
         - row_number (int): The 1-based index of the row where insertion begins.
         - direction (str, optional): Specifies the insertion direction relative to 'row_number'. Accepts 'below' (default)
           to insert after the specified row or 'above' to insert before it. Defaults to 'below'.
-        - resume_mode (bool, optional): If True, the function will fetch data from 'row_number' to check for the latest date
-          and filter out any 'values' entries older than this date to avoid duplicates. Defaults to False.
+        - resume_mode (bool, optional): If True, only the 'values' entries missing from the worksheet are inserted. When
+          'bank' is given they are found with the deduplication index; otherwise the function will fetch data from
+          'row_number' to check for the latest date and filter out any 'values' entries older than this date. Defaults to False.
         - ordered (bool, optional): Determines the sorting order of 'values' before insertion. If True, 'values' are sorted
           in ascending order based on the date; if False, they are sorted in descending order. This parameter is considered
           only when 'resume_mode' is True. Defaults to False.
+        - bulk (bool, optional): If True (default), rows are written in batched requests; if False, one request
+          per row is made. Defaults to True.
+        - bank (str, optional): The bank the rows come from ('revolut' or 'unicredit'), used to fingerprint them for
+          the deduplication index. Defaults to None.
 
         Returns:
-        - int: The number of rows successfully prepared and attempted for insertion. This may include rows filtered out
-          in 'resume_mode', so the actual number of rows inserted may be less if some entries were older than existing data.
+        - int: The number of rows prepared and attempted for insertion, after the 'resume_mode' filtering.
 
         Notes:
         - The function leverages '_filter_and_sort_values' to filter and/or sort the data based on the conditions provided
           by 'resume_mode' and 'ordered'.
         - '_insert_filtered_data' is used to handle the actual insertion of filtered and sorted data into the worksheet.
-        - In 'resume_mode', the function aims to avoid data duplication by inserting only newer data entries based on the
-          latest date found at 'row_number'. This is particularly useful for appending data without repeating entries
-          already present in the worksheet.
+        - In 'resume_mode', the function aims to avoid data duplication by inserting only the entries missing from the
+          worksheet. With the deduplication index, overlapping or out-of-order statements import exactly the missing
+          rows; without it, only entries newer than the latest date found at 'row_number' are inserted.
+        - In append mode the rows are appended after the last row of the worksheet, in ascending order whatever
+          'ordered' is, and 'row_number' is only used to find where the data starts. 'ordered' then gives the order
+          of the optional sort made afterwards.
         """
         if resume_mode:
-            latest_data = self.get_data(sheet_name, f"{row_number}:{row_number}")
-            latest_date = datetime.strptime(latest_data[0][0], "%Y-%m-%dT%H:%M:%S") if latest_data and latest_data[
-                0] and latest_data[0][0] else datetime.min
-            values = self._filter_and_sort_values(values, latest_date=latest_date, sort_ascending=ordered)
-
-        self._insert_filtered_data(sheet_name, values, row_number, direction)
+            if bank in FINGERPRINT_COLUMNS:
+                values = self._filter_unseen_values(sheet_name, values, bank, self._sort_ascending(ordered))
+            else:
+                values = self._filter_new_values(sheet_name, values, row_number, self._sort_ascending(ordered))
+
+        self._insert_filtered_data(sheet_name, values, row_number, direction, bulk=bulk, bank=bank)
+        if self._needs_sort(len(values)):
+            self._sort_rows(sheet_name, self._insert_position(row_number, direction), ascending=ordered)
         return len(values)
 
-    def insert_incomes_and_expenses(self, values, resume_mode=False, ordered=False) -> []:
+    def _target_sheets(self):
+        """
+        Returns the (worksheet name, start row) pairs the transactions are written to: the income and expenses
+        worksheets in split mode, the transactions worksheet otherwise.
+        """
+        if self.split_income_expenses:
+            return [(self.worksheet_income_name, self.income_start_row),
+                    (self.worksheet_expenses_name, self.expenses_start_row)]
+        return [(self.worksheet_transactions_name, self.transactions_start_row)]
+
+    @staticmethod
+    def _row_direction(row, bank=None):
+        """Classifies a statement row: Revolut "TOPUP"s and positive Unicredit amounts are incomes."""
+        if bank == 'unicredit':
+            is_income = isinstance(row[2], numbers.Number) and row[2] > 0
+        else:
+            is_income = row[2] == "TOPUP"
+        return Transaction.INCOME if is_income else Transaction.EXPENSE
+
+    def _partition(self, rows):
+        """
+        Distributes (row, direction) pairs among the `_target_sheets` in a single pass: by direction in split
+        mode; otherwise all to the transactions worksheet, with the direction appended as a type column.
+        """
+        if not self.split_income_expenses:
+            return [[row + [direction] for row, direction in rows]]
+        incomes, expenses = [], []
+        for row, direction in rows:
+            (incomes if direction == Transaction.INCOME else expenses).append(row)
+        return [incomes, expenses]
+
+    def _partition_values(self, values, bank=None):
+        """Partitions statement rows (header row excluded), see `_partition`."""
+        return self._partition((row, self._row_direction(row, bank)) for row in values[1:])  # Skipping the header row
+
+    def _partition_transactions(self, transactions):
+        """Partitions canonical Transactions into spreadsheet rows, see `_partition`."""
+        return self._partition((transaction.to_row(), transaction.direction) for transaction in transactions)
+
+    def _insert_partitions(self, partitions, resume_mode, ordered, bulk, bank) -> []:
+        """Inserts the rows returned by `_partition` into the `_target_sheets`, returning the number added to each."""
+        if resume_mode:
+            self._prefetch_resume_state([sheet for sheet, rows in zip(self._target_sheets(), partitions) if rows], bank)
+        added = []
+        for (sheet_name, start_row), rows in zip(self._target_sheets(), partitions):
+            added.append(self.insert_row_with_data(sheet_name, rows, start_row, direction='below',
+                                                   resume_mode=resume_mode, ordered=ordered, bulk=bulk,
+                                                   bank=bank) if rows else 0)
+        return added
+
+    def insert_incomes_and_expenses(self, values, resume_mode=False, ordered=False, bulk=True, bank=None) -> []:
         """
         Inserts provided income and expense data into their designated worksheets. The function segregates
         income and expense entries based on a specified column value and then proceeds to insert them into
@@ -257,57 +666,100 @@ class GSpreadFinanceManager:
           entry in each respective worksheet to avoid duplicating existing entries. Defaults to False.
         - ordered (bool, optional): Determines whether the data should be sorted in ascending order based on
           the first column of each row before insertion. Defaults to False.
+        - bulk (bool, optional): If True (default), rows are written in batched requests; if False, the legacy
+          per-row insertion is used. Defaults to True.
+        - bank (str, optional): The bank of the statement, enabling the deduplication index in `resume_mode`.
+          Defaults to None.
 
         Returns:
-        - list: A list containing two elements; the first is the number of income entries successfully processed
-          and attempted for insertion, and the second is similarly for expense entries. Note that the actual number
-          of rows inserted may be less than these counts if `resume_mode` filters out older entries.
+        - list: In split mode a list containing two elements; the first is the number of income entries
+          successfully processed and attempted for insertion, and the second is similarly for expense entries.
+          In non-split mode a list containing the number of entries inserted into the transactions worksheet.
+          Note that the actual number of rows inserted may be less than these counts if `resume_mode` filters
+          out older entries.
 
         Behavior:
-        - The function first segregates the input `values` into `incomes` and `expenses` based on the type indicator
-          in each row. By default, "TOPUP" is considered an income type, and all others are considered expenses.
-        - It then attempts to insert these segregated lists into their respective worksheets, as determined by
-          the class attributes `worksheet_income_name` and `worksheet_expenses_name`.
-        - The insertion process for both lists is handled by the `insert_row_with_data` method, which also
+        - The function first segregates the input `values` into `incomes` and `expenses` in a single pass, based
+          on the type indicator in each row: "TOPUP" is considered an income type, and all others are considered
+          expenses (for Unicredit statements, positive amounts are incomes).
+        - In split mode it then attempts to insert these segregated lists into their respective worksheets, as
+          determined by the class attributes `worksheet_income_name` and `worksheet_expenses_name`.
+        - In non-split mode all the rows are inserted into the `worksheet_transactions_name` worksheet, with an
+          extra last column telling whether each one is an 'income' or an 'expense'.
+        - The insertion process is handled by the `insert_row_with_data` method in both modes, which also
           incorporates the logic for `resume_mode` and `ordered` as specified by the function parameters.
+        """
+        return self._insert_partitions(self._partition_values(values, bank), resume_mode, ordered, bulk, bank)
 
-        Note:
-        - This function assumes that `split_income_expenses` is enabled. If it's not, the function will not
-          perform any insertion and will print a message indicating that non-split mode is not supported in
-          this implementation. Further implementation is required to handle non-split mode.
+    def insert_transactions(self, transactions, resume_mode=False, ordered=False, bulk=True) -> []:
         """
-        if self.split_income_expenses:
-            incomes = [v for v in values[1:] if v[2] == "TOPUP"]  # Skipping the header row
-            expenses = [v for v in values[1:] if v[2] != "TOPUP"]  # Skipping the header row
-
-            # Handle incomes
-            if incomes:
-                inc_added = self.insert_row_with_data(self.worksheet_income_name, incomes, self.income_start_row,
-                                                      direction='below', resume_mode=resume_mode, ordered=ordered)
-
-            # Handle expenses
-            if expenses:
-                exp_added = self.insert_row_with_data(self.worksheet_expenses_name, expenses, self.expenses_start_row,
-                                                      direction='below', resume_mode=resume_mode, ordered=ordered)
-            return [inc_added, exp_added]
-        else:
-            # TODO: Handling for non-split mode not implemented
-            print(
-                "Non-split mode is not supported in this example. Please configure `split_income_expenses` accordingly.")
-            return []
+        Inserts canonical Transactions, as returned by `StatementParser.read_transactions`. Transactions are
+        classified according to their direction and written with the row layout of their bank; otherwise this
+        works like `insert_incomes_and_expenses`, with the same arguments and return value.
+        """
+        bank = transactions[0].bank if transactions else None
+        return self._insert_partitions(self._partition_transactions(transactions), resume_mode, ordered, bulk, bank)
 
     def insert_data(self, sheet_name, range_name, values, skip_first_value=True, ordered=False):
         """Insert data into a specified range in a worksheet."""
         values = self._prepare_values(values, skip_first_value, ordered)
         worksheet = self._get_worksheet(sheet_name)
-        worksheet.update(range_name, values)
+        self._write(sheet_name, worksheet.update, range_name, values)
 
     def delete_row(self, sheet_name, row_index):
-        """Delete a row from a specified worksheet."""
+        """Delete a row from a specified worksheet, whose deduplication indexes are then rebuilt on next use."""
         worksheet = self._get_worksheet(sheet_name)
-        worksheet.delete_rows(row_index + 1)
+        self._write(sheet_name, worksheet.delete_rows, row_index + 1)
+        self.dedup_index.invalidate(f"{self.spreadsheet_id}/{sheet_name}/")
 
     def get_data(self, sheet_name, range_name):
         """Retrieve data from a specified range in a worksheet."""
-        worksheet = self._get_worksheet(sheet_name)
-        return worksheet.get(range_name)
+        return self.get_ranges([(sheet_name, range_name)])[0]
+
+    @staticmethod
+    def _a1_range(sheet_name, range_name=None):
+        """Returns the A1 notation of a range of a worksheet, or of the whole worksheet if `range_name` is None."""
+        quoted = "'" + sheet_name.replace("'", "''") + "'"
+        return quoted if range_name is None else f"{quoted}!{range_name}"
+
+    def _cached_ranges(self, ranges, value_render_option=None):
+        """Returns the cached values of each of `ranges`, None for those not cached."""
+        return [self.read_cache.get(self.account, self.spreadsheet_id, sheet_name, range_name, value_render_option)
+                for sheet_name, range_name in ranges]
+
+    def get_ranges(self, ranges, value_render_option=None, cache=True):
+        """
+        Retrieves several ranges, possibly of different worksheets, with a single `values.batchGet` request.
+        Ranges read in the last few seconds are served from the read cache, and only the others are requested.
+
+        Args:
+        - ranges (list of tuples): (worksheet name, A1 range) pairs, e.g. ("Incomes", "2:2"). A range of None
+          stands for the whole worksheet.
+        - value_render_option (str, optional): How the values are rendered, e.g. 'UNFORMATTED_VALUE'. Defaults
+          to the formatted values.
+        - cache (bool, optional): If False the cache is neither used nor filled, e.g. for large one-off reads.
+          Defaults to True.
+
+        Returns:
+        - list: The rows of each range, in the order of `ranges`. The rows must not be modified.
+
+        Raises:
+        - APIError: If an API error occurs that is not related to exceeding the quota limit.
+        - gspread.exceptions.WorksheetNotFound: If no worksheet with one of the names exists.
+        """
+        results = self._cached_ranges(ranges, value_render_option) if cache else [None] * len(ranges)
+        missing = [index for index, values in enumerate(results) if values is None]
+        if not missing:
+            return results
+        for sheet_name in {ranges[index][0] for index in missing}:
+            self._get_worksheet(sheet_name)
+        params = {'valueRenderOption': value_render_option} if value_render_option else None
+        response = self._request('read', self._open_spreadsheet().values_batch_get,
+                                 [self._a1_range(*ranges[index]) for index in missing], params=params)
+        for index, value_range in zip(missing, response.get('valueRanges', [])):
+            results[index] = value_range.get('values', [])
+            if cache:
+                sheet_name, range_name = ranges[index]
+                self.read_cache.put(self.account, self.spreadsheet_id, sheet_name, range_name, results[index],
+                                    value_render_option)
+        return results
@@ -0,0 +1,13 @@
+class ImportProgress:
+    """
+    Receives the progress of the imports run by AsyncGSpreadFinanceManager. This default implementation ignores
+    it; subclasses (e.g. the import jobs of the bot) override the methods they are interested in.
+    """
+    def rows_planned(self, count):
+        """`count` more rows are going to be written."""
+
+    def rows_written(self, count):
+        """`count` more rows have been written."""
+
+    def waiting(self, seconds):
+        """The import is about to wait `seconds` seconds for the quota."""
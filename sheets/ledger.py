@@ -0,0 +1,139 @@
+import json
+import threading
+import time
+from collections import Counter
+from config.config import CONFIG
+from config.database import add_column, connect
+from sheets.dedup_index import fingerprint
+
+
+class Ledger:
+    """
+    A local write-ahead buffer between the statement parser and Google Sheets. The parsed transactions are
+    committed here first and drained to the spreadsheet later by the LedgerSync worker, so that an import
+    interrupted by a Google outage or by the quota loses nothing: the rows still pending are written on the
+    next sync, without uploading the statement again.
+
+    Every transaction is identified by the fingerprint of its row (see `sheets.dedup_index.fingerprint`) and
+    by its occurrence among the identical rows of the same upload, with a unique index per spreadsheet, so
+    adding the same statement twice (or two overlapping statements) is idempotent while repeated transactions
+    are kept.
+
+    The ledger is a SQLite database at `path` in WAL mode, so the sync worker reads while new uploads are added.
+    Synced transactions are kept for a while and then dropped with `prune`, so that the ledger doesn't grow forever.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = connect(
+                self.path,
+                "CREATE TABLE IF NOT EXISTS ledger ("
+                "id INTEGER PRIMARY KEY, chat_id INTEGER, spreadsheet_id TEXT NOT NULL, upload TEXT NOT NULL, "
+                "bank TEXT NOT NULL, direction TEXT NOT NULL, timestamp TEXT, fingerprint TEXT NOT NULL, "
+                "occurrence INTEGER NOT NULL, row TEXT NOT NULL, synced INTEGER NOT NULL DEFAULT 0, synced_at REAL)",
+                "CREATE UNIQUE INDEX IF NOT EXISTS ledger_fingerprint "
+                "ON ledger (spreadsheet_id, fingerprint, occurrence)",
+                "CREATE INDEX IF NOT EXISTS ledger_pending ON ledger (chat_id, spreadsheet_id, synced)",
+                wal=True,
+            )
+            # rows synced before the time was recorded are pruned on the next `prune`
+            add_column(self._connection, 'ledger', 'synced_at', "REAL")
+        return self._connection
+
+    def add(self, chat_id, spreadsheet_id, upload, transactions, seen=None):
+        """
+        Commits the transactions of an upload, skipping those already in the ledger. Returns the number of
+        transactions added.
+
+        When an upload is added in several chunks, the same `seen` Counter must be passed for all of them so
+        that the occurrences of repeated transactions are counted across chunks.
+
+        Args:
+        - chat_id (int): The chat the transactions belong to, whose settings are used to sync them.
+        - spreadsheet_id (str): The spreadsheet the transactions are meant for.
+        - upload (str): A unique identifier of the upload (see `ImportJob.ledger_upload`), used by `discard`.
+        - transactions (list[Transaction]): The parsed transactions.
+        """
+        seen = seen if seen is not None else Counter()
+        records = []
+        for transaction in transactions:
+            row = transaction.to_row()
+            key = fingerprint(row, transaction.bank)
+            seen[key] += 1
+            timestamp = transaction.timestamp.isoformat() if transaction.timestamp is not None else None
+            records.append((chat_id, spreadsheet_id, upload, transaction.bank, transaction.direction, timestamp, key,
+                            seen[key], json.dumps(row, default=str)))
+        with self._lock:
+            connection = self._connect()
+            before = connection.total_changes
+            with connection:
+                connection.executemany(
+                    "INSERT OR IGNORE INTO ledger (chat_id, spreadsheet_id, upload, bank, direction, timestamp, "
+                    "fingerprint, occurrence, row) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", records)
+            return connection.total_changes - before
+
+    def pending(self, chat_id, spreadsheet_id, limit=5000, upload=None):
+        """
+        Returns up to `limit` transactions of a chat not synced to the spreadsheet yet, oldest first, as
+        (id, bank, direction, row) tuples; only those of `upload` if given.
+        """
+        query = "SELECT id, bank, direction, row FROM ledger WHERE chat_id = ? AND spreadsheet_id = ? AND synced = 0"
+        parameters = [chat_id, spreadsheet_id]
+        if upload is not None:
+            query += " AND upload = ?"
+            parameters.append(upload)
+        with self._lock:
+            rows = self._connect().execute(query + " ORDER BY timestamp, id LIMIT ?",
+                                           parameters + [limit]).fetchall()
+        return [(id, bank, direction, json.loads(row)) for id, bank, direction, row in rows]
+
+    def pending_chats(self):
+        """Returns the (chat_id, spreadsheet_id) pairs having transactions not synced yet."""
+        with self._lock:
+            return self._connect().execute(
+                "SELECT DISTINCT chat_id, spreadsheet_id FROM ledger WHERE synced = 0").fetchall()
+
+    def mark_synced(self, ids):
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                synced_at = time.time()
+                connection.executemany("UPDATE ledger SET synced = 1, synced_at = ? WHERE id = ?",
+                                       [(synced_at, id) for id in ids])
+
+    def forget_synced(self, spreadsheet_id):
+        """
+        Drops the transactions already synced to a spreadsheet, so that adding them again isn't ignored, e.g.
+        after rows were deleted from the sheet. Returns the number of transactions dropped.
+        """
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                return connection.execute("DELETE FROM ledger WHERE spreadsheet_id = ? AND synced = 1",
+                                          (spreadsheet_id,)).rowcount
+
+    def prune(self, retention_days):
+        """
+        Drops the transactions synced more than `retention_days` days ago. Until then they keep making a new
+        upload of the same statement a no-op in the ledger; afterwards the deduplication index of the worksheets
+        is what keeps them from being written twice. Returns the number of transactions dropped.
+        """
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                return connection.execute("DELETE FROM ledger WHERE synced = 1 AND COALESCE(synced_at, 0) < ?",
+                                          (time.time() - retention_days * 86400,)).rowcount
+
+    def discard(self, upload):
+        """Drops the transactions of an upload that aren't synced yet, e.g. because the import was cancelled."""
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("DELETE FROM ledger WHERE upload = ? AND synced = 0", (upload,))
+
+
+LEDGER = Ledger(CONFIG['SETTINGS'].get('LEDGER_PATH', 'data/ledger.sqlite3'))
@@ -0,0 +1,98 @@
+import asyncio
+import random
+import threading
+import time
+from config.config import CONFIG
+from monitoring.metrics import METRICS
+
+
+class SheetsQuotaError(Exception):
+    """Raised when a Google Sheets request keeps exceeding the quota after every retry has been spent."""
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket refilled at `rate_per_minute` tokens per minute, holding at most `capacity` tokens.
+
+    Callers reserve tokens in arrival order: when the bucket is empty the balance goes negative and every
+    reservation is told how long to wait for its own slot, so concurrent callers are served first come, first
+    served and share the rate evenly instead of polling for free tokens.
+    """
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1, rate_per_minute // 6)
+        self._tokens = float(self.capacity)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def reserve(self, tokens=1):
+        """Takes `tokens` tokens and returns the number of seconds to wait before using them."""
+        with self._lock:
+            self._refill()
+            self._tokens -= tokens
+            return max(0.0, -self._tokens / self.rate)
+
+    def hold(self, seconds):
+        """Makes the next reservation wait at least `seconds` seconds, e.g. after the server rejected a request."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+class SheetsRateLimiter:
+    """
+    Paces the Google Sheets requests of the whole process under the per-minute quotas. Read and write requests
+    are counted by separate buckets, as Google enforces separate quotas for them.
+
+    `acquire`/`acquire_async` must be called before each request; `backoff` must be called when a request is
+    rejected with a 429 anyway, and returns the jittered exponential delay imposed on every caller of that kind.
+    """
+    def __init__(self, read_per_minute=60, write_per_minute=60, base_delay=2):
+        self.buckets = {
+            'read': TokenBucket(read_per_minute),
+            'write': TokenBucket(write_per_minute),
+        }
+        self.base_delay = base_delay
+
+    def acquire(self, kind, tokens=1):
+        """Blocks until `tokens` requests of the given kind ('read' or 'write') can be made. Returns the wait."""
+        wait = self.buckets[kind].reserve(tokens)
+        if wait > 0:
+            METRICS.inc('sheets_quota_wait_seconds_total', wait, kind=kind)
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, kind, tokens=1, on_wait=None):
+        """Same as `acquire`, but waits with `asyncio.sleep`. `on_wait` is called with the wait before sleeping."""
+        wait = self.buckets[kind].reserve(tokens)
+        if wait > 0:
+            METRICS.inc('sheets_quota_wait_seconds_total', wait, kind=kind)
+            if on_wait is not None:
+                on_wait(wait)
+            await asyncio.sleep(wait)
+        return wait
+
+    def backoff(self, kind, attempt, max_delay):
+        """
+        Computes the delay before retry number `attempt` (0-based) of a request rejected for exceeding the quota:
+        exponential in the attempt, capped at `max_delay` and jittered so that concurrent callers don't retry in
+        lockstep. The bucket of that kind is held for the delay, so the next `acquire` waits it out.
+        """
+        delay = min(max_delay, self.base_delay * 2 ** attempt)
+        delay = delay / 2 + random.uniform(0, delay / 2)
+        self.buckets[kind].hold(delay)
+        METRICS.inc('sheets_backoffs_total', kind=kind)
+        METRICS.inc('sheets_backoff_seconds_total', delay, kind=kind)
+        return delay
+
+
+RATE_LIMITER = SheetsRateLimiter(
+    read_per_minute=CONFIG['SPREADSHEET'].get('READ_REQUESTS_PER_MINUTE', 60),
+    write_per_minute=CONFIG['SPREADSHEET'].get('WRITE_REQUESTS_PER_MINUTE', 60),
+    base_delay=CONFIG['SPREADSHEET'].get('BACKOFF_BASE_DELAY', 2),
+)
@@ -0,0 +1,57 @@
+import threading
+import time
+from config.config import CONFIG
+
+
+class ReadCache:
+    """
+    A short-lived, process-wide cache of the values read from the worksheets, shared by every
+    GSpreadFinanceManager so that the reads made by reports, resume checks and the like within a few seconds of
+    each other cost a single request.
+
+    Values are keyed by (service account file, spreadsheet ID, worksheet name, A1 range, value render option),
+    so a chat is only served values read with its own credentials, and expire after `ttl` seconds. The managers invalidate the worksheets they write to, so a read never returns values older than our
+    own last write; changes made by hand in the spreadsheet are seen once the entry expires.
+    """
+    def __init__(self, ttl=30):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, account, spreadsheet_id, sheet_name, range_name, render_option=None):
+        """
+        Returns the values of a range cached for the service account file `account`, or None if missing or
+        expired. The values must not be modified.
+        """
+        key = (account, spreadsheet_id, sheet_name, range_name, render_option)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            values, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            return values
+
+    def put(self, account, spreadsheet_id, sheet_name, range_name, values, render_option=None):
+        with self._lock:
+            self._entries[(account, spreadsheet_id, sheet_name, range_name, render_option)] = (values,
+                                                                                              time.monotonic())
+
+    def invalidate(self, spreadsheet_id=None, sheet_name=None):
+        """
+        Drops cached values, whatever the service account that read them. Without arguments the whole cache is
+        cleared; with a `spreadsheet_id` only the values of that spreadsheet are dropped, and with a `sheet_name`
+        too only those of that worksheet.
+        """
+        with self._lock:
+            if spreadsheet_id is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries
+                        if key[1] == spreadsheet_id and (sheet_name is None or key[2] == sheet_name)]:
+                del self._entries[key]
+
+
+READ_CACHE = ReadCache(ttl=CONFIG['SPREADSHEET'].get('READ_CACHE_TTL', 30))
@@ -0,0 +1,7 @@
+# MIME types of the supported statement formats
+MIME_TYPES = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+# signature of the ZIP archives, the container of the XLSX files
+ZIP_SIGNATURE = b'PK\x03\x04'
@@ -1,8 +1,31 @@
+import io
+from contextlib import contextmanager
+import numpy as np
 import pandas as pd
 from openpyxl import load_workbook
-from models.revolut_transaction import TransactionRevolut
-from models.unicredit_transaction import TransactionUnicredit
-from datetime import datetime
+from models.transaction import ISO_FORMAT, Transaction, currency_exponent
+from sheets.statement_formats import MIME_TYPES, ZIP_SIGNATURE
+
+# for each bank, the statement column found at each position of a serialized transaction
+SERIALIZED_COLUMNS = {
+    'revolut': (2, 3, 0, 1, 4, 5, 6, 7, 8, 9),
+    'unicredit': (0, 1, 2, 3),
+}
+# statement columns holding dates and numbers
+DATE_COLUMNS = {
+    'revolut': (2, 3),
+    'unicredit': (0,),
+}
+NUMERIC_COLUMNS = {
+    'revolut': (5, 6, 9),
+    'unicredit': (2,),
+}
+# positions in a serialized transaction of the amount, currency and description, and of the bank-specific
+# fields kept in Transaction.extra
+TRANSACTION_COLUMNS = {
+    'revolut': (5, 7, 4, (1, 2, 3, 6, 8, 9)),
+    'unicredit': (2, 3, 1, ()),
+}
 
 
 class StatementParser:
@@ -12,73 +35,205 @@ class StatementParser:
     with a uniform structure, ready for further processing or storage.
 
     Attributes:
-    - file_path (str): Path to the statement file to be parsed.
+    - source (str, bytes or binary file object): The statement to be parsed: the path of a file, or its content
+      already in memory (e.g. a Telegram download), so that nothing needs to be written to disk.
     - file_format (str): Indicates the bank type of the statement ('revolut' or 'unicredit'). This is used to
       determine the specific parsing and processing logic to apply.
+    - mime_type (str, optional): The declared MIME type of the statement. The format (CSV or Excel) is detected
+      from the content; the MIME type, or else the extension of a path, is only checked against it.
 
     Methods:
-    - read_data(): Reads the statement file based on its extension (CSV or Excel) and processes the data.
-    - _read_excel_to_list(): Helper method to read an Excel file and convert its content into a list of rows.
-    - _process_data(data): Processes the raw data rows into a standardized list of transaction objects.
-    - _serialize_transaction(transaction): Converts a transaction object into a list of values, serializing
-      datetime objects into ISO format strings when necessary.
+    - read_transactions(): Reads the statement, detecting its format (CSV or Excel) from the content, and returns
+      its transactions in the canonical Transaction representation shared by every bank.
+    - iter_transactions(chunk_size): Streams the statement file, yielding the transactions in chunks, so that
+      memory stays flat whatever the size of the file.
+    - _read_excel_to_list(stream): Helper method to read an Excel file and convert its content into a list of rows.
+    - _normalize_frame(frame): Normalizes the columns of the raw data as a DataFrame, whole columns at once.
+    - _frame_to_transactions(frame): Converts the raw data as a DataFrame into canonical Transactions.
 
     Raises:
     - ValueError: If the 'file_format' is not recognized as a supported bank type or if the file is not in an
-      expected format (CSV or Excel), or if an unsupported transaction type is encountered during serialization.
+      expected format (CSV or Excel).
     """
-    def __init__(self, file_path, file_format):
-        self.file_path = file_path
+    def __init__(self, source, file_format, mime_type=None):
+        self.source = source
         self.file_format = file_format
+        self.mime_type = mime_type
         if self.file_format not in ['revolut', 'unicredit']:
             raise ValueError("Unexpected bank type")
 
-    def read_data(self):
-        if self.file_path.endswith('.csv'):
-            data = pd.read_csv(self.file_path)
-        elif self.file_path.endswith('.xlsx'):
-            data = self._read_excel_to_list()
-        else:
+    @contextmanager
+    def _open(self):
+        """Yields a binary stream positioned at the start of the statement."""
+        if isinstance(self.source, str):
+            with open(self.source, 'rb') as stream:
+                yield stream
+            return
+        stream = io.BytesIO(self.source) if isinstance(self.source, (bytes, bytearray, memoryview)) else self.source
+        stream.seek(0)
+        yield stream
+
+    def _declared_format(self):
+        if self.mime_type is not None:
+            return next((kind for kind, mime_type in MIME_TYPES.items() if mime_type == self.mime_type), None)
+        if isinstance(self.source, str):
+            return next((kind for kind in MIME_TYPES if self.source.endswith('.' + kind)), None)
+        return None
+
+    def _detect_format(self, stream):
+        """
+        Returns 'xlsx' or 'csv' according to the first bytes of the statement: XLSX files are ZIP archives, anything
+        else is read as CSV text.
+
+        Raises:
+        - ValueError: If the statement is declared as an Excel file, by its MIME type or extension, but isn't one.
+        """
+        signature = stream.read(len(ZIP_SIGNATURE))
+        stream.seek(0)
+        if signature == ZIP_SIGNATURE:
+            return 'xlsx'
+        if self._declared_format() == 'xlsx':
             raise ValueError("The file must be in CSV or Excel format.")
-        return self._process_data(data)
-
-    def _read_excel_to_list(self):
-        wb = load_workbook(filename=self.file_path)
-        sheet = wb.active
-        return [list(row) for row in sheet.iter_rows(values_only=True)]
-
-    def _process_data(self, data):
-        transactions = []
-        for row in data:
-            if self.file_format == 'revolut':
-                transaction = TransactionRevolut(*row)
-            elif self.file_format == 'unicredit':
-                transaction = TransactionUnicredit(*row)
-            transactions.append(self._serialize_transaction(transaction))
-        return transactions
-
-    def _serialize_transaction(self, transaction):
-        if isinstance(transaction, TransactionRevolut):
-            return [
-                transaction.started_date.isoformat() if isinstance(transaction.started_date,
-                                                                   datetime) else transaction.started_date,
-                transaction.completed_date.isoformat() if isinstance(transaction.completed_date,
-                                                                     datetime) else transaction.completed_date,
-                transaction.type,
-                transaction.product,
-                transaction.description,
-                transaction.amount,
-                transaction.fee,
-                transaction.currency,
-                transaction.state,
-                transaction.balance
-            ]
-        elif isinstance(transaction, TransactionUnicredit):
-            return [
-                transaction.data.isoformat() if isinstance(transaction.data, datetime) else transaction.data,
-                transaction.description,
-                transaction.importo,
-                transaction.currency
-            ]
+        return 'csv'
+
+    def read_transactions(self):
+        """Reads the whole statement and returns its transactions as canonical Transaction objects."""
+        return self._frame_to_transactions(self._read_frame())
+
+    def iter_transactions(self, chunk_size=1000):
+        """
+        Streaming counterpart of `read_transactions`, yielding lists of at most `chunk_size` Transactions. CSV
+        files are read with pandas' chunked reader, Excel files with openpyxl's read-only row iterator.
+        """
+        for frame in self._iter_frames(chunk_size):
+            yield self._frame_to_transactions(frame)
+
+    def _read_frame(self):
+        """Reads the whole statement, returning a DataFrame of its rows without the header row."""
+        with self._open() as stream:
+            if self._detect_format(stream) == 'csv':
+                return pd.read_csv(stream)
+            return pd.DataFrame(self._read_excel_to_list(stream)[1:])
+
+    def _iter_frames(self, chunk_size):
+        """Reads the statement in DataFrames of at most `chunk_size` rows, skipping the header row."""
+        with self._open() as stream:
+            if self._detect_format(stream) == 'csv':
+                yield from pd.read_csv(stream, chunksize=chunk_size)
+                return
+            wb = load_workbook(filename=stream, read_only=True)
+            try:
+                rows = wb.active.iter_rows(values_only=True)
+                next(rows, None)  # Skipping the header row
+                chunk = []
+                for row in rows:
+                    chunk.append(row)
+                    if len(chunk) == chunk_size:
+                        yield pd.DataFrame(chunk)
+                        chunk = []
+                if chunk:
+                    yield pd.DataFrame(chunk)
+            finally:
+                wb.close()
+
+    def _read_excel_to_list(self, stream):
+        wb = load_workbook(filename=stream, read_only=True)
+        try:
+            return [list(row) for row in wb.active.iter_rows(values_only=True)]
+        finally:
+            wb.close()
+
+    @staticmethod
+    def _column_values(column):
+        """Returns the values of a column as a list, with None for the missing cells."""
+        return column.to_numpy(dtype=object, na_value=None).tolist()
+
+    @staticmethod
+    def _format_dates(dates, column):
+        """
+        Formats parsed dates as ISO strings, with numpy's C formatter rather than `Series.dt.strftime`, which
+        formats one Timestamp at a time. Cells that couldn't be parsed keep the value they had in `column`.
+        """
+        if dates.dt.tz is not None:
+            formatted = dates.dt.strftime(ISO_FORMAT).tolist()
+        else:
+            formatted = np.datetime_as_string(dates.to_numpy(dtype='datetime64[s]'), unit='s').tolist()
+        if dates.hasnans:
+            raw = StatementParser._column_values(column)
+            formatted = [original if missing else value
+                         for value, original, missing in zip(formatted, raw, dates.isna().tolist())]
+        return formatted
+
+    @staticmethod
+    def _to_datetimes(dates):
+        """Returns parsed dates as a list of naive datetime objects, None where a date couldn't be parsed."""
+        if dates.dt.tz is not None:
+            dates = dates.dt.tz_localize(None)
+        # datetime64[us] converts to datetime objects in C, and NaT to None
+        return dates.to_numpy(dtype='datetime64[us]').astype(object).tolist()
+
+    def _normalize_frame(self, frame):
+        """
+        Normalizes the columns of a statement DataFrame (addressed by position, whatever their labels) with
+        whole-column operations: dates are parsed and formatted as ISO strings, amounts are converted to numbers
+        and missing cells become None. Cells that can't be parsed are kept as they are.
+
+        Returns a tuple with:
+        - the columns of the serialized transactions, as lists of values;
+        - the numeric columns as float arrays (NaN where a cell isn't a number), by position;
+        - the direction of each transaction: 'income' (Revolut TOPUPs, positive Unicredit amounts) or 'expense';
+        - the parsed date of each transaction, a datetime or None.
+        """
+        bank = self.file_format
+        columns = []
+        numbers = {}
+        dates = None
+        for position, source in enumerate(SERIALIZED_COLUMNS[bank]):
+            column = frame.iloc[:, source]
+            if source in DATE_COLUMNS[bank]:
+                parsed = column if pd.api.types.is_datetime64_any_dtype(column) else \
+                    pd.to_datetime(column, errors='coerce', dayfirst=bank == 'unicredit')
+                dates = parsed if dates is None else dates
+                columns.append(self._format_dates(parsed, column))
+            elif source in NUMERIC_COLUMNS[bank]:
+                parsed = column if pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column) \
+                    else pd.to_numeric(column, errors='coerce')
+                numbers[position] = parsed.to_numpy(dtype=float)
+                values = parsed.tolist()
+                if parsed.hasnans:
+                    values = [original if missing else value for value, original, missing
+                              in zip(values, self._column_values(column), parsed.isna().tolist())]
+                columns.append(values)
+            else:
+                columns.append(self._column_values(column))
+
+        if bank == 'revolut':
+            is_income = (frame.iloc[:, 0] == "TOPUP").to_numpy()
         else:
-            raise ValueError("Transaction type not supported")
+            is_income = numbers[SERIALIZED_COLUMNS[bank].index(2)] > 0
+        directions = np.where(is_income, Transaction.INCOME, Transaction.EXPENSE).tolist()
+        return columns, numbers, directions, self._to_datetimes(dates)
+
+    def _frame_to_transactions(self, frame):
+        """Returns the canonical Transactions of a statement DataFrame, converting the amounts to minor units."""
+        if frame.empty:
+            return []
+        bank = self.file_format
+        columns, numbers, directions, timestamps = self._normalize_frame(frame)
+        amount_column, currency_column, description_column, extra_columns = TRANSACTION_COLUMNS[bank]
+
+        currencies = columns[currency_column]
+        exponents = {currency: currency_exponent(currency) for currency in set(currencies)}
+        scale = 10.0 ** np.array([exponents[currency] for currency in currencies], dtype=float)
+        amounts = np.rint(numbers[amount_column] * scale)
+        if extra_columns:
+            extras = zip(*(columns[position] for position in extra_columns))
+        else:
+            extras = [()] * len(currencies)
+
+        return [
+            Transaction(timestamp, int(amount) if amount == amount else None, currency, direction, description,
+                        bank, extra)
+            for timestamp, amount, currency, direction, description, extra in zip(
+                timestamps, amounts.tolist(), currencies, directions, columns[description_column], extras)
+        ]
@@ -0,0 +1,73 @@
+import threading
+import time
+from config.config import CONFIG
+
+
+class WorksheetCache:
+    """
+    A process-wide cache of opened gspread handles. Opening a spreadsheet and looking up one of its worksheets
+    costs a metadata request each, so the handles are kept here and shared by every GSpreadFinanceManager.
+
+    A handle is bound to the client, and so to the service account, that opened it. Spreadsheets are therefore
+    keyed by (service account file, spreadsheet ID) and worksheets by (service account file, spreadsheet ID,
+    worksheet name): changing `SPREADSHEET_ID`, a worksheet name or `SERVICE_ACCOUNT_FILE` in the settings never
+    returns a handle of the old sheet, and a chat never uses a handle opened with the credentials of another
+    chat. Entries expire after `ttl` seconds and can be dropped explicitly with `invalidate`.
+    """
+    def __init__(self, ttl=3600):
+        self.ttl = ttl
+        self._spreadsheets = {}
+        self._worksheets = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, entries, key):
+        entry = entries.get(key)
+        if entry is None:
+            return None
+        handle, stored_at = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del entries[key]
+            return None
+        return handle
+
+    def get_spreadsheet(self, account, spreadsheet_id):
+        """
+        Returns the Spreadsheet `spreadsheet_id` cached for the service account file `account`, or None if
+        missing or expired.
+        """
+        with self._lock:
+            return self._lookup(self._spreadsheets, (account, spreadsheet_id))
+
+    def put_spreadsheet(self, account, spreadsheet_id, spreadsheet):
+        with self._lock:
+            self._spreadsheets[(account, spreadsheet_id)] = (spreadsheet, time.monotonic())
+
+    def get_worksheet(self, account, spreadsheet_id, sheet_name):
+        """Returns the cached Worksheet named `sheet_name`, or None if missing or expired."""
+        with self._lock:
+            return self._lookup(self._worksheets, (account, spreadsheet_id, sheet_name))
+
+    def put_worksheet(self, account, spreadsheet_id, sheet_name, worksheet):
+        with self._lock:
+            self._worksheets[(account, spreadsheet_id, sheet_name)] = (worksheet, time.monotonic())
+
+    def invalidate(self, spreadsheet_id=None, sheet_name=None):
+        """
+        Drops cached handles, whatever the service account that opened them. Without arguments the whole cache
+        is cleared; with a `spreadsheet_id` only the handles of that spreadsheet are dropped, and with a
+        `sheet_name` too only that worksheet.
+        """
+        with self._lock:
+            if spreadsheet_id is None:
+                self._spreadsheets.clear()
+                self._worksheets.clear()
+                return
+            if sheet_name is None:
+                for key in [key for key in self._spreadsheets if key[1] == spreadsheet_id]:
+                    del self._spreadsheets[key]
+            for key in [key for key in self._worksheets
+                        if key[1] == spreadsheet_id and (sheet_name is None or key[2] == sheet_name)]:
+                del self._worksheets[key]
+
+
+WORKSHEET_CACHE = WorksheetCache(ttl=CONFIG['SPREADSHEET'].get('WORKSHEET_CACHE_TTL', 3600))
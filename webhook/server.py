@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import time
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+from config.config import CONFIG
+from monitoring.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+class UpdateScheduler:
+    """
+    Processes the updates received by the webhook in the background, at most `max_concurrent` at a time, while
+    keeping the updates of each chat in the order they were received: an update starts only once the previous
+    update of its chat is done, so the FSM flows (e.g. choosing the bank and then sending the statement) see
+    their steps in order. Updates waiting for their chat don't take one of the `max_concurrent` slots.
+
+    Updates without a chat are ordered by user, those without a user aren't ordered at all.
+    """
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, max_concurrent=16):
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.max_concurrent = max_concurrent
+        self._semaphore = None
+        self._last = {}
+        self._tasks = set()
+
+    @staticmethod
+    def _order_key(update):
+        try:
+            event = update.event
+        except Exception:  # an update type aiogram doesn't know
+            return None
+        chat = getattr(event, 'chat', None) or getattr(getattr(event, 'message', None), 'chat', None)
+        if chat is not None:
+            return 'chat', chat.id
+        user = getattr(event, 'from_user', None)
+        if user is not None:
+            return 'user', user.id
+        return None
+
+    def submit(self, update: Update):
+        """Schedules an update, must be called from the running event loop."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        key = self._order_key(update)
+        task = asyncio.create_task(self._process(update, self._last.get(key), time.perf_counter()))
+        self._tasks.add(task)
+        if key is not None:
+            self._last[key] = task
+        task.add_done_callback(lambda done: self._done(key, done))
+
+    async def _process(self, update, previous, received_at):
+        if previous is not None:
+            await asyncio.wait({previous})
+        async with self._semaphore:
+            METRICS.observe('webhook_queue_seconds', time.perf_counter() - received_at)
+            await self.dispatcher.feed_update(self.bot, update)
+
+    def _done(self, key, task):
+        self._tasks.discard(task)
+        if self._last.get(key) is task:
+            del self._last[key]
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Update processing failed", exc_info=task.exception())
+
+    @property
+    def pending(self):
+        """The number of updates received and not processed yet, running ones included."""
+        return len(self._tasks)
+
+    async def close(self, timeout=30):
+        """Waits up to `timeout` seconds for the scheduled updates, then cancels those still pending."""
+        if self._tasks:
+            _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+class WebhookServer:
+    """
+    Receives the updates from Telegram with a webhook instead of long polling: an aiohttp server listening on
+    `host`:`port` answers the POSTs made to `path` right away and hands the updates to an UpdateScheduler. The
+    webhook is registered on startup as `url` + `path`; with a `secret`, requests not carrying it in the
+    X-Telegram-Bot-Api-Secret-Token header are refused, as are bodies that aren't a valid update (400). GET
+    /healthz answers 200, for the load balancers.
+
+    Several processes can run behind a load balancer, but the updates of a chat are only ordered within a
+    process, and the FSM state must then be kept in a storage shared by all of them.
+    """
+    def __init__(self, url, path='/webhook', host='0.0.0.0', port=8080, secret=None, max_concurrent=16):
+        self.url = url
+        self.path = path
+        self.host = host
+        self.port = port
+        self.secret = secret
+        self.max_concurrent = max_concurrent
+        self.scheduler = None
+        self.bot = None
+
+    async def run(self, dispatcher: Dispatcher, bot: Bot):
+        """Serves the webhook until cancelled, then waits for the updates being processed."""
+        self.bot = bot
+        self.scheduler = UpdateScheduler(dispatcher, bot, self.max_concurrent)
+        app = web.Application()
+        app.router.add_post(self.path, self._handle_update)
+        app.router.add_get('/healthz', self._handle_health)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, self.host, self.port).start()
+            await bot.set_webhook(self.url.rstrip('/') + self.path, secret_token=self.secret,
+                                  allowed_updates=dispatcher.resolve_used_update_types())
+            logger.info("Webhook listening on %s:%s%s", self.host, self.port, self.path)
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
+            await self.scheduler.close()
+            await bot.session.close()
+
+    async def _handle_update(self, request):
+        if self.secret and request.headers.get(SECRET_HEADER) != self.secret:
+            METRICS.inc('webhook_rejected_total')
+            return web.Response(status=401)
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except ValueError as e:  # a body that isn't JSON (JSONDecodeError) or isn't an update (ValidationError)
+            METRICS.inc('webhook_rejected_total')
+            logger.warning("Malformed update refused: %s", e)
+            return web.Response(status=400)
+        METRICS.inc('webhook_updates_total')
+        self.scheduler.submit(update)
+        return web.Response()
+
+    async def _handle_health(self, request):
+        return web.json_response({'status': 'ok', 'pending_updates': self.scheduler.pending})
+
+
+WEBHOOK_SERVER = WebhookServer(
+    url=CONFIG['TELEGRAM'].get('WEBHOOK_URL', ''),
+    path=CONFIG['TELEGRAM'].get('WEBHOOK_PATH', '/webhook'),
+    host=CONFIG['TELEGRAM'].get('WEBHOOK_HOST', '0.0.0.0'),
+    port=CONFIG['TELEGRAM'].get('WEBHOOK_PORT', 8080),
+    secret=CONFIG['TELEGRAM'].get('WEBHOOK_SECRET') or None,
+    max_concurrent=CONFIG['TELEGRAM'].get('MAX_CONCURRENT_UPDATES', 16),
+)